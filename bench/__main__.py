@@ -0,0 +1,153 @@
+"""Benchmark fplan over the examples and synthetic large plans
+
+    python -m bench                          # run, write bench_results.json
+    python -m bench --out new.json --compare bench_results.json
+    python -m bench --solver highs-ds        # time another LP backend
+
+Each case times Data loading, model build, the solver and both
+printers, keeping the fastest of --repeat runs.  --compare flags any
+phase that got slower than --threshold times the stored baseline.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+from src.fplan import backends, perf
+from src.fplan.fplan import DEFAULT_METHOD, Data, print_ascii, print_csv, solve
+
+PHASES = ['load', 'build', 'solve', 'ascii', 'csv']
+
+
+def synthetic() -> dict[str, dict]:
+    """ Scaled up configs that stress one dimension each """
+    base = {'returns': 6, 'inflation': 2.5,
+            'aftertax': {'bal': 400000, 'basis': 200000},
+            'IRA': {'bal': 900000},
+            'roth': {'bal': 100000}}
+    cases = {}
+    cases['horizon-95y'] = dict(base, startage=25, endage=120)
+    cases['horizon-95y-balance'] = dict(base, startage=25, endage=120,
+                                        formulation='balance')
+    # 20 brackets from 10% to 48%
+    taxrates = [[i * 40000, 10 + 2 * i] for i in range(20)]
+    cases['brackets-20'] = dict(base, startage=45, endage=100,
+                                taxes={'taxrates': taxrates})
+    cases['cashflows-400'] = dict(base, startage=45, endage=100,
+        income={'i%d' % i: {'amount': 1000 + i, 'age': '%d-' % (50 + i % 40),
+                            'inflation': i % 2 == 0, 'tax': i % 3 == 0}
+                for i in range(200)},
+        expense={'e%d' % i: {'amount': 500 + i, 'age': '%d-%d' % (45 + i % 30, 60 + i % 30),
+                             'inflation': i % 2 == 1}
+                 for i in range(200)})
+    cases['workyears-40'] = dict(base, startage=22, endage=100,
+                                 prep={'workyears': 40, 'maxsave': 50000})
+    return cases
+
+def cases() -> dict[str, tuple[str | None, dict | None, str]]:
+    """ name -> (config file, config dict, formulation) """
+    c = {}
+    for f in sorted(glob.glob('examples/*.toml')):
+        c[os.path.basename(f)[:-5]] = (f, None, 'sum')
+    for (name, d) in synthetic().items():
+        formulation = d.pop('formulation', 'sum')
+        c[name] = (None, d, formulation)
+    return c
+
+def _load(file: str | None, d: dict | None) -> Data:
+    S = Data()
+    if file:
+        S.load_file(file)
+    else:
+        S.load(json.loads(json.dumps(d)))       # load() changes d
+    return S
+
+def run_case(file: str | None, d: dict | None, formulation: str,
+             repeat: int, method: str = DEFAULT_METHOD) -> dict:
+    best = {k: float('inf') for k in PHASES}
+    # untimed, so the first case measured doesn't pay for importing the solver
+    solve(_load(file, d), False, formulation=formulation, method=method)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        S = _load(file, d)
+        best['load'] = min(best['load'], time.perf_counter() - start)
+
+        with perf.Profiler(memory=False) as prof:
+            res = solve(S, False, formulation=formulation, method=method)
+        totals = prof.totals()
+        best['build'] = min(best['build'], totals['build']['wall'])
+        best['solve'] = min(best['solve'], totals['solve']['wall'])
+
+        for (name, printer) in [('ascii', print_ascii), ('csv', print_csv)]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                printer(S, res)
+                best[name] = min(best[name], time.perf_counter() - start)
+
+    model = prof.models[0]
+    return dict(best, rows=model['rows'], cols=model['cols'], nnz=model['nnz'],
+                iterations=prof.solver[0]['iterations'], spend=float(res[0]))
+
+def compare(new: dict, old: dict, threshold: float,
+            min_delta: float = 0.001) -> list[str]:
+    """ Phases more than threshold times slower than the baseline """
+    slower = []
+    for (name, r) in new['cases'].items():
+        base = old['cases'].get(name)
+        if base is None:
+            continue
+        for k in PHASES:
+            if k in base and r[k] > base[k] * threshold and r[k] - base[k] > min_delta:
+                slower.append("%s %s: %.4fs -> %.4fs (%.2fx)" %
+                              (name, k, base[k], r[k], r[k] / base[k]))
+    return slower
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument('-o', '--out', default='bench_results.json',
+                        help="write results here (default bench_results.json)")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="flag regressions against a stored result file")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--solver', choices=backends.METHODS, default=DEFAULT_METHOD)
+    parser.add_argument('-k', metavar='SUBSTR',
+                        help="only run cases with SUBSTR in the name")
+    args = parser.parse_args()
+
+    results = {'info': {'python': platform.python_version(),
+                        'machine': platform.machine(),
+                        'time': time.time(),
+                        'solver': args.solver},
+               'cases': {}}
+    print(("%-22s" + " %8s" * 5 + " %6s %7s") %
+          ("case", *PHASES, "rows", "nnz"))
+    for (name, (file, d, formulation)) in cases().items():
+        if args.k and args.k not in name:
+            continue
+        r = run_case(file, d, formulation, args.repeat, args.solver)
+        results['cases'][name] = r
+        print(("%-22s" + " %8.4f" * 5 + " %6d %7d") %
+              (name, *[r[k] for k in PHASES], r['rows'], r['nnz']))
+        sys.stdout.flush()
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.threshold)
+        for s in slower:
+            print("REGRESSION", s)
+        if slower:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
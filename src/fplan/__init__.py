@@ -1 +1,10 @@
-from .fplan import main
+import time
+
+# when the package started loading, for fplan check's startup numbers
+import_start = time.perf_counter()
+
+
+def main():
+    # import the planner only when run, not when the package is imported
+    from .fplan import main
+    return main()
@@ -0,0 +1,239 @@
+"""LP solver backends
+
+Every backend takes the arrays of a Model and returns a
+scipy.optimize.OptimizeResult with x, fun, status, message, nit and
+the constraint marginals, so callers don't care which one ran.
+
+  highs-ds, highs-ipm, highs   scipy.optimize.linprog() methods
+  highspy                      HiGHS directly, when highspy is installed.
+                               Keeps the last basis for each model shape
+                               and warm starts the next solve from it.
+  auto                         picked by choose() from the model size
+"""
+
+import importlib.util
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+# scipy.optimize, scipy.sparse and highspy are most of fplan's startup
+# time, so they are only imported by the functions that solve
+if TYPE_CHECKING:
+    import scipy.optimize
+
+HAVE_HIGHSPY = importlib.util.find_spec('highspy') is not None
+
+LINPROG_METHODS = ['highs-ds', 'highs-ipm', 'highs']
+METHODS = LINPROG_METHODS + (['highspy'] if HAVE_HIGHSPY else []) + ['auto']
+
+# auto: dual simplex was faster than IPM on every fplan model measured,
+# up to ~40k rows and ~220k nonzeros.  Past that IPM's lower iteration
+# count should win.
+AUTO_IPM_NNZ = 1_000_000
+
+# method -> {'count': solves, 'time': total seconds}
+timings = {}
+
+
+def unimported(method: str) -> list[str]:
+    """ Modules solving with method needs that aren't imported yet """
+    needed = ['scipy.sparse', 'scipy.optimize'] + (['highspy'] if method == 'highspy' else [])
+    return [m for m in needed if m not in sys.modules]
+
+def choose(rows: int, cols: int, nnz: int) -> str:
+    """ The method auto uses for a model of this size """
+    return 'highs-ipm' if nnz > AUTO_IPM_NNZ else 'highs-ds'
+
+def _linprog(method: str, c, A_ub, b_ub, A_eq, b_eq, bounds, verbose: bool):
+    import scipy.optimize
+    return scipy.optimize.linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq,
+                                  bounds=bounds, method=method,
+                                  options={"disp": verbose})
+
+def _highs_lp(c, A_ub, b_ub, A_eq, b_eq, bounds):
+    """ The LP as a HighsLp, inequality rows first """
+    import highspy
+    import scipy.sparse
+    A = A_ub if A_eq is None else scipy.sparse.vstack([A_ub, A_eq])
+    A = scipy.sparse.csc_array(A)
+    lp = highspy.HighsLp()
+    lp.num_col_ = len(c)
+    lp.num_row_ = A.shape[0]
+    lp.col_cost_ = np.asarray(c, dtype=float)
+    if bounds is None:
+        (lp.col_lower_, lp.col_upper_) = (np.zeros(len(c)), np.full(len(c), np.inf))
+    else:
+        (lp.col_lower_, lp.col_upper_) = (bounds[:, 0], bounds[:, 1])
+    lp.row_lower_ = np.concatenate([np.full(A_ub.shape[0], -np.inf),
+                                    np.zeros(0) if A_eq is None else b_eq])
+    lp.row_upper_ = np.concatenate([b_ub, np.zeros(0) if A_eq is None else b_eq])
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    lp.a_matrix_.num_col_ = A.shape[1]
+    lp.a_matrix_.num_row_ = A.shape[0]
+    return lp
+
+def _status(status) -> int:
+    """ HiGHS model status -> linprog status code """
+    import highspy
+    s = highspy.HighsModelStatus
+    return {s.kOptimal: 0,
+            s.kIterationLimit: 1,
+            s.kInfeasible: 2,
+            s.kUnbounded: 3,
+            s.kUnboundedOrInfeasible: 2}.get(status, 4)
+
+def _highs_result(h, c, n_ub: int) -> 'scipy.optimize.OptimizeResult':
+    """ What linprog would have returned for the model solved in h """
+    import scipy.optimize
+    status = h.getModelStatus()
+    res = scipy.optimize.OptimizeResult(
+        status=_status(status),
+        message=h.modelStatusToString(status),
+        nit=h.getInfo().simplex_iteration_count)
+    res.success = res.status == 0
+    if res.success:
+        sol = h.getSolution()
+        res.x = np.array(sol.col_value)
+        res.fun = float(np.dot(c, res.x))
+        dual = np.array(sol.row_dual)
+        res.ineqlin = scipy.optimize.OptimizeResult(marginals=dual[:n_ub])
+        res.eqlin = scipy.optimize.OptimizeResult(marginals=dual[n_ub:])
+    else:
+        res.x = None
+    return res
+
+def _highs(verbose: bool):
+    import highspy
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', bool(verbose))
+    h.setOptionValue('solver', 'simplex')
+    return h
+
+class _Highspy:
+    """ One Highs object per process, warm started from the last basis """
+    def __init__(self):
+        self.h = None
+        self.basis = {}         # (rows, cols, nnz) -> HighsBasis
+
+    def __call__(self, c, A_ub, b_ub, A_eq, b_eq, bounds, verbose: bool):
+        if self.h is None:
+            self.h = _highs(verbose)
+        h = self.h
+        h.setOptionValue('output_flag', bool(verbose))
+        lp = _highs_lp(c, A_ub, b_ub, A_eq, b_eq, bounds)
+        h.passModel(lp)
+
+        shape = (lp.num_row_, lp.num_col_, len(lp.a_matrix_.value_))
+        if shape in self.basis:
+            h.setBasis(self.basis[shape])
+        h.run()
+        res = _highs_result(h, c, A_ub.shape[0])
+        if res.success:
+            if len(self.basis) >= 64 and shape not in self.basis:
+                self.basis.clear()              # long running, many shapes
+            self.basis[shape] = h.getBasis()
+        return res
+
+class Parametric:
+    """ One LP solved again and again after changing a bound or the costs
+
+    With highspy the model stays loaded and each solve starts from the
+    previous optimal basis, which after a small change is only a few
+    simplex iterations away.  Without it every solve() is a cold
+    linprog() call.
+    """
+    def __init__(self, c, A_ub, b_ub, A_eq=None, b_eq=None, bounds=None,
+                 verbose: bool = False):
+        self.c = np.array(c, dtype=float)
+        self.n_ub = A_ub.shape[0]
+        if bounds is None:
+            bounds = np.column_stack([np.zeros(len(c)), np.full(len(c), np.inf)])
+        (self.A_ub, self.b_ub, self.A_eq, self.b_eq) = (A_ub, np.array(b_ub, dtype=float),
+                                                        A_eq, b_eq)
+        self.bounds = np.array(bounds, dtype=float)
+        self.verbose = verbose
+        self.h = None
+        if HAVE_HIGHSPY:
+            self.h = _highs(verbose)
+            self.h.passModel(_highs_lp(self.c, A_ub, self.b_ub, A_eq, b_eq, self.bounds))
+
+    def set_row_upper(self, row: int, value: float) -> None:
+        """ New right hand side for inequality row """
+        self.b_ub[row] = value
+        if self.h:
+            self.h.changeRowBounds(row, -np.inf, value)
+
+    def set_rows_upper(self, rows: np.ndarray, value: float) -> None:
+        """ set_row_upper() for many inequality rows at once """
+        rows = np.asarray(rows, dtype=np.int32)
+        self.b_ub[rows] = value
+        if self.h:
+            self.h.changeRowsBounds(len(rows), rows, np.full(len(rows), -np.inf),
+                                    np.full(len(rows), float(value)))
+
+    def set_col_bounds(self, col: int, lower: float, upper: float) -> None:
+        self.bounds[col] = (lower, upper)
+        if self.h:
+            self.h.changeColBounds(col, lower, upper)
+
+    def set_cost(self, c: np.ndarray) -> None:
+        self.c = np.array(c, dtype=float)
+        if self.h:
+            idx = np.arange(len(c), dtype=np.int32)
+            self.h.changeColsCost(len(c), idx, self.c)
+
+    def solve(self) -> 'scipy.optimize.OptimizeResult':
+        method = 'highspy' if self.h else 'highs-ds'
+        start = time.perf_counter()
+        if self.h:
+            self.h.run()
+            res = _highs_result(self.h, self.c, self.n_ub)
+        else:
+            res = self._linprog(method)
+        _time(method, time.perf_counter() - start)
+        return res
+
+    def _linprog(self, method: str) -> 'scipy.optimize.OptimizeResult':
+        # linprog takes no infinite bounds, so rows set to inf are left
+        # out and get a marginal of 0
+        keep = np.isfinite(self.b_ub)
+        if keep.all():
+            return _linprog(method, self.c, self.A_ub, self.b_ub, self.A_eq,
+                            self.b_eq, self.bounds, self.verbose)
+        res = _linprog(method, self.c, self.A_ub[keep], self.b_ub[keep], self.A_eq,
+                       self.b_eq, self.bounds, self.verbose)
+        if res.get('ineqlin') is not None:
+            marginals = np.zeros(self.n_ub)
+            marginals[keep] = res.ineqlin.marginals
+            res.ineqlin.marginals = marginals
+        return res
+
+def _time(method: str, seconds: float) -> None:
+    t = timings.setdefault(method, {'count': 0, 'time': 0.0})
+    t['count'] += 1
+    t['time'] += seconds
+
+_highspy = _Highspy()
+
+def run(method: str, c, A_ub, b_ub, A_eq=None, b_eq=None, bounds=None,
+        verbose: bool = False) -> tuple['scipy.optimize.OptimizeResult', str]:
+    """ (result, method that ran), method may be 'auto' """
+    if method == 'auto':
+        nnz = A_ub.nnz + (0 if A_eq is None else A_eq.nnz)
+        rows = A_ub.shape[0] + (0 if A_eq is None else A_eq.shape[0])
+        method = choose(rows, len(c), nnz)
+    if method not in METHODS:
+        raise ValueError("unknown solver method %s (have %s)" %
+                         (method, ', '.join(METHODS)))
+    start = time.perf_counter()
+    if method == 'highspy':
+        res = _highspy(c, A_ub, b_ub, A_eq, b_eq, bounds, verbose)
+    else:
+        res = _linprog(method, c, A_ub, b_ub, A_eq, b_eq, bounds, verbose)
+    _time(method, time.perf_counter() - start)
+    return (res, method)
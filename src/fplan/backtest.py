@@ -0,0 +1,165 @@
+"""How the plan would have done starting in each year of history
+
+    fplan backtest plan.toml history.csv
+    fplan backtest plan.toml history.csv --replay
+
+history.csv has one row per year with the year, that year's return and
+its inflation, both in percent like the config:
+
+    year,returns,inflation
+    1928,43.8,-1.2
+    ...
+
+Each start year gives a window of plan_years() actual rates.  By
+default each window is solved as its own LP, which is the spending the
+plan could have afforded knowing that history in advance.  --replay
+instead takes the plan solved at the config's fixed rates and runs its
+withdrawals (kept level in real terms) through each window, reporting
+when an account ran dry and how far short it ended up.
+
+Growth and inflation are accumulated over the whole history once and
+each window's tables are a slice of those.  Windows are spread over a
+process pool, each worker compiles the LP once and re-solves it.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+
+import numpy as np
+
+from .fplan import (Data, ModelTemplate, Solution, SolveError, Tables, ledger,
+                    plan_years, solve)
+
+
+def read_history(path: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ (years, returns, inflation), rates as yearly multipliers (1.06) """
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError("%s has no rows" % path)
+    missing = {'year', 'returns', 'inflation'} - set(rows[0])
+    if missing:
+        raise ValueError("%s needs columns %s" % (path, ', '.join(sorted(missing))))
+    years = np.array([int(r['year']) for r in rows])
+    if np.any(np.diff(years) != 1):
+        raise ValueError("%s must list consecutive years" % path)
+    returns = 1 + np.array([float(r['returns']) for r in rows]) / 100
+    inflation = 1 + np.array([float(r['inflation']) for r in rows]) / 100
+    return (years, returns, inflation)
+
+def window_tables(S: Data, returns: np.ndarray, inflation: np.ndarray) -> list[Tables]:
+    """ Tables for every window of plan_years(S) consecutive years """
+    n = plan_years(S)
+    if len(returns) < n:
+        raise ValueError("the plan needs %d years of history, have %d" %
+                         (n, len(returns)))
+    G = np.concatenate([[1.0], np.cumprod(returns)])
+    I = np.concatenate([[1.0], np.cumprod(inflation)])
+    return [Tables.from_multipliers(S, G[s:s + n + 1] / G[s], I[s:s + n + 1] / I[s])
+            for s in range(len(returns) - n + 1)]
+
+def outcome(S: Data, x: np.ndarray, T: Tables) -> dict:
+    """ First age an account is overdrawn (None if never) and the money
+    left at the end in today's dollars, plan x replayed through T """
+    L = ledger(S, x, T)
+    y = L.years
+    end = S.workyr + S.numyr
+    g = T.G[end] / T.G[end - 1]
+    last = y[-1]
+    final = np.array([last['savings'] - last['fsavings'],
+                      last['ira'] - last['fira'] - last['sepp'] - last['ira2roth'],
+                      last['roth'] + last['ira2roth'] - last['froth']]) * g
+    # rounding in the solver leaves balances a few cents below zero
+    low = (np.minimum(np.minimum(y['savings'], y['ira']), y['roth']) < -1)
+    depleted = int(y['age'][np.argmax(low)]) if low.any() else None
+    if depleted is None and np.any(final < -1):
+        depleted = S.retireage + S.numyr
+    return {'depleted': depleted, 'estate': float(final.sum() / T.I[end])}
+
+def real_plan(S: Data, x: np.ndarray, T: Tables) -> np.ndarray:
+    """ Plan x with every contribution and withdrawal moved from the
+    config's inflation to T's, so it buys the same as planned """
+    x = np.array(x, dtype=float)
+    P = Solution(S, x)
+    I = S.tables.I
+    work = np.arange(S.workyr)
+    year = np.arange(S.numyr) + S.workyr
+    P.work[:] *= (T.I[work] / I[work])[:, None]
+    P.years[:] *= (T.I[year] / I[year])[:, None]
+    return x
+
+# per-process state, set once by _init()
+_worker = {}
+
+def _init(S: Data, sepp: bool, tables: list[Tables], plan: np.ndarray | None) -> None:
+    _worker.update(S=S, tables=tables, plan=plan)
+    if plan is None:
+        _worker['template'] = ModelTemplate(S, sepp)
+
+def _window(k: int) -> dict:
+    (S, T, plan) = (_worker['S'], _worker['tables'][k], _worker['plan'])
+    if plan is not None:
+        x = real_plan(S, plan, T)
+    else:
+        try:
+            x = _worker['template'].solve(S, tables=T)
+        except SolveError as e:
+            return {'status': 'failed', 'message': e.res.message}
+    r = {'status': 'ok', 'spend': float(x[0])}
+    r.update(outcome(S, x, T))
+    return r
+
+def backtest(S: Data, returns: np.ndarray, inflation: np.ndarray,
+             sepp: bool = False, replay: bool = False,
+             jobs: int | None = None) -> list[dict]:
+    """ One result per start year, in order
+
+    Each is {'status', 'spend', 'depleted', 'estate'}, spend in today's
+    dollars and depleted the first age an account is overdrawn.
+    """
+    tables = window_tables(S, returns, inflation)
+    plan = solve(S, sepp) if replay else None
+    jobs = jobs or os.cpu_count() or 1
+    chunk = max(1, -(-len(tables) // (4 * jobs)))
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init,
+            initargs=(S, sepp, tables, plan)) as pool:
+        return list(pool.map(_window, range(len(tables)), chunksize=chunk))
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan backtest")
+    parser.add_argument('--replay', action='store_true',
+                        help="run the fixed rate plan through history "
+                        "instead of solving each window")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('conffile')
+    parser.add_argument('history', help="CSV of year,returns,inflation")
+    args = parser.parse_args(argv)
+
+    S = Data()
+    S.load_file(args.conffile)
+    try:
+        (years, returns, inflation) = read_history(args.history)
+        table = backtest(S, returns, inflation, args.sepp, args.replay, args.jobs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    out = csv.writer(sys.stdout)
+    out.writerow(['start', 'status', 'spend', 'depleted', 'shortfall'])
+    for (year, r) in zip(years, table):
+        if r['status'] == 'ok':
+            depleted = '' if r['depleted'] is None else r['depleted']
+            out.writerow([year, 'ok', round(r['spend']), depleted,
+                          round(max(0, -r['estate']))])
+        else:
+            out.writerow([year, "%s: %s" % (r['status'], r['message']), '', '', ''])
+    if args.replay:
+        ok = [r for r in table if r['status'] == 'ok']
+        bad = sum(r['depleted'] is not None for r in ok)
+        print("\n%d of %d start years ran short" % (bad, len(ok)), file=sys.stderr)
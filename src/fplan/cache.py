@@ -0,0 +1,151 @@
+"""On-disk cache of solved plans
+
+Results are keyed on a hash of everything that reaches the LP (the
+loaded Data fields and the sepp flag) and the solver method.  Each entry is one .npz file
+holding res.x and a little metadata.  The least recently used entries
+are removed once the cache grows past its size limit.  A cache that
+can't be written or read is skipped, it never fails a solve.
+"""
+
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+
+from . import fplan, perf
+from .fplan import Data
+
+# bump when the LP changes in a way the Data fields don't capture
+CACHE_VERSION = 1
+
+def cache_dir() -> str:
+    """ $FPLAN_CACHE, else $XDG_CACHE_HOME/fplan, else ~/.cache/fplan """
+    if 'FPLAN_CACHE' in os.environ:
+        return os.environ['FPLAN_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'fplan')
+
+def _canonical(v):
+    if isinstance(v, dict):
+        return {str(k): _canonical(x) for (k, x) in v.items()}
+    if isinstance(v, (list, tuple, np.ndarray)):
+        return [_canonical(x) for x in v]
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v)
+    if isinstance(v, (int, np.integer)):
+        return int(v)
+    if isinstance(v, (float, np.floating)):
+        return repr(float(v))
+    return v
+
+def plan_key(S: Data, sepp: bool, formulation: str = 'sum',
+             method: str | None = None) -> str:
+    """ Hash of the normalized plan inputs and the solver method
+
+    Methods agree on the optimum but not on which of several optimal
+    plans they return, so each has its own entries.
+    """
+    # tables is derived from the other fields
+    fields = {k: v for (k, v) in vars(S).items()
+              if not k.startswith('_') and k != 'tables'}
+    d = {'version': CACHE_VERSION,
+         'sepp': sepp,
+         'formulation': formulation,
+         'method': method,
+         'vper': S.vper,
+         'n1': S.n1,
+         'cg_tax': fplan.cg_tax,
+         'RMD': fplan.RMD,
+         'data': fields}
+    s = json.dumps(_canonical(d), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(s.encode()).hexdigest()
+
+class Cache:
+    """ Size bounded LRU cache of solutions in a directory """
+    def __init__(self, path: str | None = None, max_bytes: int = 64 << 20):
+        self.path = path or cache_dir()
+        self.max_bytes = max_bytes
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key: str) -> tuple[np.ndarray, dict] | None:
+        """ (res.x, metadata) or None """
+        f = self._file(key)
+        try:
+            with np.load(f) as z:
+                (x, meta) = (z['x'], json.loads(str(z['meta'])))
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            return None
+        try:
+            os.utime(f)                         # mark as recently used
+        except OSError:
+            pass
+        return (x, meta)
+
+    def put(self, key: str, x: np.ndarray, meta: dict) -> None:
+        """ Store an entry, does nothing if the directory can't be written """
+        tmp = self._file(key) + '.%d.tmp' % os.getpid()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.savez(f, x=x, meta=np.array(json.dumps(meta)))
+            os.replace(tmp, self._file(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def entries(self) -> list[os.DirEntry]:
+        """ Cache files, least recently used first """
+        try:
+            files = [e for e in os.scandir(self.path) if e.name.endswith('.npz')]
+        except OSError:
+            return []
+        return sorted(files, key=lambda e: e.stat().st_mtime)
+
+    def evict(self) -> None:
+        try:
+            entries = self.entries()
+            total = sum(e.stat().st_size for e in entries)
+        except OSError:
+            return
+        for e in entries:
+            if total <= self.max_bytes:
+                break
+            total -= e.stat().st_size
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        for e in self.entries():
+            os.remove(e.path)
+
+def cached_solve(S: Data, sepp: bool, verbose: bool = False,
+                 cache: Cache | None = None,
+                 formulation: str = 'sum',
+                 method: str | None = None) -> np.ndarray:
+    """ solve() unless the same plan was already solved with method """
+    cache = cache or Cache()
+    with perf.phase('cache'):
+        key = plan_key(S, sepp, formulation, method)
+        hit = cache.get(key)
+    if hit is not None:
+        if verbose:
+            print("Cached result %s (solved in %.3fs)" % (key[:12], hit[1]['time']))
+        return hit[0]
+
+    start = time.perf_counter()
+    x = fplan.solve(S, sepp, verbose, formulation=formulation, method=method)
+    cache.put(key, x, {'status': 0,
+                       'time': time.perf_counter() - start,
+                       'created': time.time()})
+    return x
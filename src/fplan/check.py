@@ -0,0 +1,59 @@
+"""Check configs without solving them
+
+    fplan check plan.toml configs/
+
+Loads every config the way a solve would (Data.load_file, including
+income and expense parsing) and reports the ones that fail, without
+loading the LP solver.  It ends with how long fplan took to import and
+start, and whether scipy got loaded, so startup regressions show up.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from . import fplan, import_start
+from .fplan import Data
+
+
+def check_file(file: str) -> str | None:
+    """ Why file doesn't load, None if it does """
+    try:
+        Data().load_file(file)
+    except Exception as e:
+        return "%s: %s" % (type(e).__name__, e)
+    return None
+
+def main(argv: list[str]) -> None:
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(prog="fplan check")
+    parser.add_argument('paths', nargs='+', metavar='FILE',
+                        help="configs to check (or directories of .toml configs)")
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.toml')))
+        else:
+            files.append(path)
+
+    bad = 0
+    for file in files:
+        error = check_file(file)
+        print("%-6s %s" % ('ok' if error is None else 'error', file))
+        if error is not None:
+            print("    " + error)
+            bad += 1
+    done = time.perf_counter()
+
+    print()
+    print("import:  %6.1f ms" % (1000 * (fplan.loaded - import_start)))
+    print("startup: %6.1f ms" % (1000 * (started - import_start)))
+    print("check:   %6.1f ms for %d configs" % (1000 * (done - started), len(files)))
+    print("scipy:   %s" % ('loaded' if 'scipy' in sys.modules else 'not loaded'))
+    print("%d of %d configs ok" % (len(files) - bad, len(files)))
+    if bad:
+        sys.exit(1)
@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
+import importlib
 import re
+import sys
+import time
+from typing import TYPE_CHECKING
 try:
     import tomllib
 except ModuleNotFoundError:
     import tomli as tomllib
-import scipy.optimize
+import numpy as np
+# scipy is imported where the LP is built, so loading configs and
+# `fplan --help` don't pay for it
+if TYPE_CHECKING:
+    import scipy.optimize
+    import scipy.sparse
+
+from . import backends, perf
 
 # Required Minimal Distributions from IRA starting with age 73
 # last updated for 2024
@@ -18,7 +30,11 @@ RMD = [27.4, 26.5, 25.5, 24.6, 23.7, 22.9, 22.0, 21.1, 20.2, 19.4,  # age 72-81
 
 cg_tax = 0.15                   # capital gains tax rate
 
-def agelist(str):
+def ageranges(str):
+    """ (first, last) age of each part of an age list like '62,65-67,70-'
+
+    An open range (70-) runs to 120.
+    """
     for x in str.split(','):
         m = re.match(r'^(\d+)(-(\d+)?)?$', x)
         if m:
@@ -30,19 +46,38 @@ def agelist(str):
                     e = int(e)
                 else:
                     e = 120
-            for a in range(s,e+1):
-                yield a
+            if e < s:
+                raise Exception("Bad age range " + x)
+            yield (s, e)
         else:
             raise Exception("Bad age " + str)
 
+def load_config(file: str) -> dict:
+    """ The parsed config in file, a TOML config or a snapshot """
+    from . import snapshot
+    if snapshot.is_snapshot(file):
+        return snapshot.config(file)
+    with open(file) as conffile:
+        return tomllib.loads(conffile.read())
+
 class Data:
     vper: int = 4        # variables per year (savings, ira, roth, ira2roth)
     n1: int = 2          # before-retire years start here
     n0: int              # post-retirement years start here
 
     def load_file(self, file):
-        with open(file) as conffile:
-            d = tomllib.loads(conffile.read())
+        """ Load a TOML config, or a snapshot (see snapshot.py) """
+        from . import snapshot
+        if snapshot.is_snapshot(file):
+            with perf.phase('snapshot'):
+                snapshot.load_into(self, file)
+            return
+        with perf.phase('toml'):
+            d = load_config(file)
+        self.load(d)
+
+    def load(self, d: dict):
+        """ Load from a parsed config file, d is modified in place """
         self.i_rate = 1 + d.get('inflation', 0) / 100       # inflation rate: 2.5 -> 1.025
         self.r_rate = 1 + d.get('returns', 6) / 100         # invest rate: 6 -> 1.06
 
@@ -90,6 +125,8 @@ class Data:
         self.aftertax = d.get('aftertax', {'bal': 0})
         if 'basis' not in self.aftertax:
             self.aftertax['basis'] = 0
+        if self.aftertax['basis'] > 0 and self.aftertax['bal'] == 0:
+            raise ValueError("aftertax basis %d with no balance" % self.aftertax['basis'])
 
         self.IRA = d.get('IRA', {'bal': 0})
         if 'maxcontrib' not in self.IRA:
@@ -101,387 +138,972 @@ class Data:
         if 'contributions' not in self.roth:
             self.roth['contributions'] = []
 
-        self.parse_expenses(d)
         self.sepp_end = max(5, 59-self.retireage)  # first year you can spend IRA reserved for SEPP
         self.sepp_ratio = 25                       # money per-year from SEPP  (bal/ratio)
 
+        self.update_tables()
+        with perf.phase('parse_expenses'):
+            self.parse_expenses(d)
+
+    def update_tables(self):
+        """ Recompute self.tables, needed after changing rates or ages """
+        self.tables = Tables(self)
+
     def parse_expenses(self, S):
-        """ Return array of income/expense per year """
-        INC = [0] * self.numyr
-        EXP = [0] * self.numyr
-        TAX = [0] * self.numyr
-
-        for k,v in S.get('expense', {}).items():
-            for age in agelist(v['age']):
-                year = age - self.retireage
-                if year < 0:
-                    continue
-                elif year >= self.numyr:
-                    break
-                else:
-                    amount = v['amount']
-                    if v.get('inflation'):
-                        amount *= self.i_rate ** (year + self.workyr)
-                    EXP[year] += amount
-
-        for k,v in S.get('income', {}).items():
-            for age in agelist(v['age']):
-                year = age - self.retireage
-                if year < 0:
-                    continue
-                elif year >= self.numyr:
-                    break
-                else:
-                    amount = v['amount']
-                    if v.get('inflation'):
-                        amount *= self.i_rate ** (year + self.workyr)
-                    INC[year] += amount
-                    if v.get('tax'):
-                        TAX[year] += amount
-        self.income = INC
-        self.expenses = EXP
-        self.taxed = TAX
+        """ Income, expenses and taxed income per year as arrays
+
+        Each age range adds its amount where it starts and takes it
+        off after it ends in a difference array, so the cost is per
+        range, not per year covered.  Amounts that follow inflation
+        have their own arrays and are inflated once at the end.
+        """
+        # rows: income, expenses, taxed, then the same with inflation
+        (rows, start, stop, amount) = ([], [], [], [])
+        for (key, row) in [('income', 0), ('expense', 1)]:
+            for v in S.get(key, {}).values():
+                inflated = 3 if v.get('inflation') else 0
+                r = [row + inflated]
+                if key == 'income' and v.get('tax'):
+                    r.append(2 + inflated)
+                for (s, e) in ageranges(v['age']):
+                    for k in r:
+                        rows.append(k)
+                        start.append(s)
+                        stop.append(e + 1)
+                        amount.append(v['amount'])
+        rows = np.array(rows, dtype=int)
+        start = np.clip(np.array(start, dtype=int) - self.retireage, 0, self.numyr)
+        stop = np.clip(np.array(stop, dtype=int) - self.retireage, 0, self.numyr)
+        amount = np.array(amount, dtype=float)
+        diff = np.zeros((6, self.numyr + 1))
+        np.add.at(diff, (rows, start), amount)
+        np.add.at(diff, (rows, stop), -amount)
+        flow = np.cumsum(diff[:, :-1], axis=1)
+        flow = flow[:3] + flow[3:] * self.tables.i_mul
+        (self.income, self.expenses, self.taxed) = flow
+
+def plan_years(S: Data) -> int:
+    """ Number of yearly returns/inflation values a plan needs """
+    return S.workyr + max(S.numyr, S.sepp_end)
+
+def _multipliers(fixed: float, rates, nyears: int) -> np.ndarray:
+    """ Cumulative product of yearly rates: 1, r0, r0*r1, ... """
+    if rates is None:
+        return fixed ** np.arange(nyears + 1)
+    rates = np.asarray(rates, dtype=float)
+    if rates.size < nyears:
+        raise ValueError("need %d yearly rates, got %d" % (nyears, rates.size))
+    return np.concatenate([[1.0], np.cumprod(rates[:nyears])])
+
+def _tax_table(S: Data) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Bracket cuts, rates with state tax, and the tax owed at each cut
+
+    All before inflation.
+    """
+    cut = np.array([x for (x, _) in S.taxrates], dtype=float)
+    rate = np.array([y for (_, y) in S.taxrates], dtype=float)
+    rate = np.where(rate > 0, rate + S.state_tax, rate)  # if below fed std_ded, assumes tax 0%
+    # tax owed at the bottom of each bracket
+    taxbase = np.cumsum(np.diff(cut, prepend=0) * np.concatenate([[0], rate[:-1]]))
+    return (cut, rate, taxbase)
+
+class Tables:
+    """ Per-year factors for a plan, computed once
+
+    G[k] and I[k] are the growth and inflation of $1 from the start of
+    the plan to year k, so money grows by G[k]/G[j] from year j to year
+    k.  Work year y is year y and retirement year t is year workyr+t.
+    The rest is per retirement year t (and tax bracket k):
+      i_mul[t]      inflation since the start of the plan
+      cut[t, k]     inflated bracket cuts
+      base[t, k]    inflated tax owed at each cut
+      rate[k]       bracket rates including state tax
+      basis[t]      taxable part of aftertax withdrawals
+    returns and inflation optionally replace S.r_rate and S.i_rate with
+    a sequence of yearly rates (1.06, 0.97, ...), see plan_years().
+    """
+    def __init__(self, S: 'Data', returns=None, inflation=None):
+        nyears = plan_years(S)
+        self._fill(S, _multipliers(S.r_rate, returns, nyears),
+                   _multipliers(S.i_rate, inflation, nyears))
+
+    @classmethod
+    def from_multipliers(cls, S: 'Data', G: np.ndarray, I: np.ndarray) -> 'Tables':
+        """ Tables for cumulative growth G and inflation I already at hand """
+        T = cls.__new__(cls)
+        T._fill(S, G, I)
+        return T
+
+    def _fill(self, S: 'Data', G: np.ndarray, I: np.ndarray) -> None:
+        (self.G, self.I) = (G, I)
+
+        year = np.arange(S.numyr)
+        self.i_mul = self.I[year + S.workyr]
+        (cut, self.rate, base) = _tax_table(S)
+        self.cut = cut[None, :] * self.i_mul[:, None]
+        self.base = base[None, :] * self.i_mul[:, None]
+
+        # aftertax basis
+        # XXX fix work contributions
+        if S.aftertax['basis'] > 0:
+            self.basis = 1 - (S.aftertax['basis'] /
+                              (S.aftertax['bal'] * self.G[year + S.workyr]))
+        else:
+            self.basis = np.ones(S.numyr)
 
 # Minimize: c^T * x
 # Subject to: A_ub * x <= b_ub
 #vars: money, per year(savings, ira, roth, ira2roth)  (193 vars)
 #all vars positive
-def solve(S: Data, sepp: bool, verbose: bool = False) -> list[float]:
-    # optimize this poly (we want to maximize the money we can spend)
-    vper = S.vper
-    n1 = S.n1
-    n0 = S.n0
-
-    nvars = n1 + vper * (S.numyr + S.workyr)
-    c = [0] * nvars
-    c[0] = -1
-
-    A = []
-    b = []
-
-    if not sepp:
-        # force SEPP to zero
-        row = [0] * nvars
-        row[1] = 1
-        A += [row]
-        b += [0]
-
+class SolveError(Exception):
+    """ The solver failed to find an optimal plan """
+    def __init__(self, res):
+        super().__init__(res.message)
+        self.res = res
+        self.status = res.status
+
+class InfeasibleError(SolveError):
+    """ No plan meets every constraint, usually spending more than there is """
+
+class UnboundedError(SolveError):
+    """ Spending could grow without limit, the config is missing a constraint """
+
+def _solve_error(res) -> SolveError:
+    return {2: InfeasibleError, 3: UnboundedError}.get(res.status, SolveError)(res)
+
+class Model:
+    """ A linear program in the form scipy.optimize.linprog() expects """
+    def __init__(self, c: np.ndarray, A_ub: 'scipy.sparse.csr_array',
+                 b_ub: np.ndarray, blocks: dict[str, slice],
+                 A_eq: 'scipy.sparse.csr_array | None' = None,
+                 b_eq: np.ndarray | None = None,
+                 eq_blocks: dict[str, slice] | None = None,
+                 bounds: np.ndarray | None = None):
+        self.c = c
+        self.A_ub = A_ub
+        self.b_ub = b_ub
+        self.blocks = blocks        # constraint block name -> rows in A_ub
+        self.A_eq = A_eq
+        self.b_eq = b_eq
+        self.eq_blocks = eq_blocks or {}
+        self.bounds = bounds        # (nvars, 2) or None for all vars >= 0
+        self.presolved = 0          # rows removed by presolve()
+
+@functools.lru_cache(maxsize=256)
+def _below(n: int, first: int, slope: int = 1,
+           cap: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Return every (i, y) pair with 0 <= y < min(first + slope*i, cap)
+
+    Only depends on the shape of the plan so the arrays are shared (and
+    read-only) between every model built with the same shape.
+    """
+    ends = first + slope * np.arange(n)
+    if cap is not None:
+        ends = np.minimum(ends, cap)
+    ends = np.maximum(ends, 0)
+    i = np.repeat(np.arange(n), ends)
+    y = np.arange(i.size) - np.repeat(np.cumsum(ends) - ends, ends)
+    i.flags.writeable = False
+    y.flags.writeable = False
+    return (i, y)
+
+# Each constraint block below returns (nrows, rows, cols, vals, b) where
+# rows are numbered from zero within the block.  Years are counted from
+# the start of the plan as in Tables.
+
+def _sepp_block(S: Data, sepp: bool, T: Tables):
+    if sepp:
+        return (0, [], [], [], [])
+    # force SEPP to zero
+    return (1, [0], [1], [1], [0])
+
+def _work_block(S: Data, sepp: bool, T: Tables):
     # Work contributions don't exceed limits
-    for year in range(S.workyr):
-        # can't exceed maxsave per year
-        row = [0] * nvars
-        row[n1+year*vper+0] = S.worktax
-        row[n1+year*vper+1] = 1
-        row[n1+year*vper+2] = S.worktax
-        A += [row]
-        if S.maxsave_inflation:
-            b += [S.maxsave * S.i_rate ** year]
-        else:
-            b += [S.maxsave]
-
-        # max IRA per year
-        row = [0] * nvars
-        row[n1+year*vper+1] = 1
-        A += [row]
-        b += [S.IRA['maxcontrib'] * S.i_rate ** year]
-
-        # max Roth per year
-        row = [0] * nvars
-        row[n1+year*vper+2] = 1
-        A += [row]
-        b += [S.roth['maxcontrib'] * S.i_rate ** year]
+    if S.workyr == 0:
+        return (0, [], [], [], [])
+    y = np.arange(S.workyr)
+    col = S.n1 + S.vper * y
+    one = np.ones(S.workyr)
+    # per year: can't exceed maxsave, max IRA, max Roth
+    rows = np.concatenate([3*y, 3*y, 3*y, 3*y+1, 3*y+2])
+    cols = np.concatenate([col, col+1, col+2, col+1, col+2])
+    vals = np.concatenate([S.worktax * one, one, S.worktax * one, one, one])
+    if S.maxsave_inflation:
+        maxsave = S.maxsave * T.I[y]
+    else:
+        maxsave = S.maxsave * one
+    b = np.stack([maxsave,
+                  S.IRA['maxcontrib'] * T.I[y],
+                  S.roth['maxcontrib'] * T.I[y]], axis=1).ravel()
+    return (3 * S.workyr, rows, cols, vals, b)
 
+def _bracket_block(S: Data, sepp: bool, T: Tables):
     # The constraint starts like this:
     #   TAX = RATE * (IRA + IRA2ROTH + SS - SD - CUT) + BASE
     #   CG_TAX = SAVINGS * (1-(BASIS/(S_BAL*rate^YR))) * 20%
     #   GOAL + EXTRA >= SAVING + IRA + ROTH + SS - TAX
-    for year in range(S.numyr):
-        i_mul = S.i_rate ** (year + S.workyr)
-
-        # aftertax basis
-        # XXX fix work contributions
-        if S.aftertax['basis'] > 0:
-            basis = 1 - (S.aftertax['basis'] /
-                         (S.aftertax['bal']*S.r_rate**(year + S.workyr)))
-        else:
-            basis = 1
-
-        (taxbase, last_cut, last_rate) = (0, 0, 0)
-        for (cut, rate) in S.taxrates:
-            if rate > 0:                             # if below fed std_ded, assumes tax 0%
-                rate += S.state_tax 
-            taxbase += (cut - last_cut) * last_rate * i_mul
-            (last_cut, last_rate) = (cut, rate)
-            base = taxbase
-            row = [0] * nvars
-            row[0] = i_mul                           # goal is positive
-
-            if year < S.sepp_end:
-                row[1] = (-1 + rate) * (1/S.sepp_ratio) # income from SEPP amount
-            cut *= i_mul
-            # aftertax withdrawal + capital gains tax
-            row[n0+vper*year+0] = -1 + basis * (cg_tax + S.state_cg_tax)
-
-            if year + S.retireage < 59:
-                row[n0+vper*year+1] = -0.9 + rate    # 10% penelty
-            else:
-                row[n0+vper*year+1] = -1 + rate      # IRA - tax
-
-            # XXX How to model 10% penelty for Roth before 59 other than
-            # contributions
-            row[n0+vper*year+2] = -1                 # Roth
-
-            row[n0+vper*year+3] = rate + 0.0001       # tax on Roth conversion
-                                                      # + 0.0001 hack so that conversions 
-                                                      # look slightly inferior to withdrawals
-            A += [row]
-
-            base -= S.income[year]                    # must spend all income this year (temp)
-            base += S.expenses[year]
-            base += S.taxed[year]*rate                # extra income is taxed
-
-            # offset from having this taxrate from zero
-            b += [(cut + S.stded * i_mul) * rate - base]
-
+    # One row per (year, taxrate), year major.
+    ntax = len(S.taxrates)
+    year = np.arange(S.numyr)
+    t = np.repeat(year, ntax)
+    k = np.tile(np.arange(ntax), S.numyr)
+    row = np.arange(S.numyr * ntax)
+    col = S.n0 + S.vper * t
+    r = T.rate[k]
+    i_mul = T.i_mul
+    early = t + S.retireage < 59
+    sepp_row = t < S.sepp_end
+    rows = np.concatenate([row, row[sepp_row], row, row, row, row])
+    cols = np.concatenate([np.zeros_like(row),
+                           np.ones_like(row[sepp_row]),
+                           col, col+1, col+2, col+3])
+    vals = np.concatenate([
+        i_mul[t],                                # goal is positive
+        (-1 + r[sepp_row]) * (1/S.sepp_ratio),   # income from SEPP amount
+        -1 + T.basis[t] * (cg_tax + S.state_cg_tax), # aftertax withdrawal + capital gains tax
+        np.where(early, -0.9 + r, -1 + r),       # IRA - tax, 10% penelty before 59
+        # XXX How to model 10% penelty for Roth before 59 other than
+        # contributions
+        -np.ones_like(r),                        # Roth
+        r + 0.0001])                             # tax on Roth conversion
+                                                 # + 0.0001 hack so that conversions
+                                                 # look slightly inferior to withdrawals
+
+    base = T.base[t, k].copy()
+    base -= np.asarray(S.income)[t]             # must spend all income this year (temp)
+    base += np.asarray(S.expenses)[t]
+    base += np.asarray(S.taxed)[t] * r          # extra income is taxed
+
+    # offset from having this taxrate from zero
+    b = (T.cut[t, k] + S.stded * i_mul[t]) * r - base
+    return (S.numyr * ntax, rows, cols, vals, b)
+
+def _savings_block(S: Data, sepp: bool, T: Tables):
     # final balance for savings needs to be positive
-    row = [0] * nvars
-    inc = 0
-    for year in range(S.numyr):
-        row[n0+vper*year+0] = S.r_rate ** (S.numyr - year)
-        #if S.income[year] > 0:
-        #    inc += S.income[year] * S.r_rate ** (S.numyr - year)
-    for year in range(S.workyr):
-        row[n1+vper*year+0] = -(S.r_rate ** (S.numyr + S.workyr - year))
-    A += [row]
-    b += [S.aftertax['bal'] * S.r_rate ** (S.workyr + S.numyr) + inc]
-
-    # any years with income need to be positive in aftertax
-    # for year in range(S.numyr):
-    #     if S.income[year] == 0:
-    #         continue
-    #     row = [0] * nvars
-    #     inc = 0
-    #     for y in range(year):
-    #         row[n0+vpy*y+0] = S.r_rate ** (year - y)
-    #         inc += S.income[y] * S.r_rate ** (year - y)
-    #     A += [row]
-    #     b += [S.aftertax['bal'] * S.r_rate ** year + inc]
-
+    end = S.workyr + S.numyr
+    year = np.arange(S.numyr)
+    work = np.arange(S.workyr)
+    cols = np.concatenate([S.n0 + S.vper * year, S.n1 + S.vper * work])
+    vals = np.concatenate([T.G[end] / T.G[S.workyr + year],
+                           -T.G[end] / T.G[work]])
+    b = [S.aftertax['bal'] * T.G[end]]
+    return (1, np.zeros_like(cols), cols, vals, b)
+
+def _ira_block(S: Data, sepp: bool, T: Tables):
     # final balance for IRA needs to be positive
-    row = [0] * nvars
-    for year in range(S.numyr):
-        row[n0+vper*year+1] = S.r_rate ** (S.numyr - year)
-        row[n0+vper*year+3] = S.r_rate ** (S.numyr - year)
-        if year < S.sepp_end:
-            row[1] += (1/S.sepp_ratio) * S.r_rate ** (S.numyr - year)
-    for year in range(S.workyr):
-        row[n1+vper*year+1] = -(S.r_rate ** (S.numyr + S.workyr - year))
-    A += [row]
-    b += [S.IRA['bal'] * S.r_rate ** (S.workyr + S.numyr)]
-
+    end = S.workyr + S.numyr
+    year = np.arange(S.numyr)
+    work = np.arange(S.workyr)
+    col = S.n0 + S.vper * year
+    g = T.G[end] / T.G[S.workyr + year]
+    cols = np.concatenate([col+1, col+3, [1], S.n1 + S.vper * work + 1])
+    vals = np.concatenate([g, g,
+                           [np.sum((1/S.sepp_ratio) * g[year < S.sepp_end])],
+                           -T.G[end] / T.G[work]])
+    b = [S.IRA['bal'] * T.G[end]]
+    return (1, np.zeros_like(cols), cols, vals, b)
+
+def _sepp_end_block(S: Data, sepp: bool, T: Tables):
     # IRA balance at SEPP end needs to not touch SEPP money
-    row = [0] * nvars
-    for year in range(S.sepp_end):
-        row[n0+vper*year+1] = S.r_rate ** (S.sepp_end - year)
-        row[n0+vper*year+3] = S.r_rate ** (S.sepp_end - year)
-    for year in range(S.workyr):
-        row[n1+vper*year+1] = -(S.r_rate ** (S.sepp_end + S.workyr - year))
-    row[1] = S.r_rate ** S.sepp_end
-    A += [row]
-    b += [S.IRA['bal'] * S.r_rate ** S.sepp_end]
-
+    end = S.workyr + S.sepp_end
+    year = np.arange(min(S.sepp_end, S.numyr))
+    work = np.arange(S.workyr)
+    col = S.n0 + S.vper * year
+    g = T.G[end] / T.G[S.workyr + year]
+    cols = np.concatenate([col+1, col+3, S.n1 + S.vper * work + 1, [1]])
+    vals = np.concatenate([g, g, -T.G[end] / T.G[work],
+                           [T.G[end] / T.G[S.workyr]]])
+    b = [S.IRA['bal'] * T.G[end] / T.G[S.workyr]]
+    return (1, np.zeros_like(cols), cols, vals, b)
+
+def _roth59_block(S: Data, sepp: bool, T: Tables):
     # before 59, Roth can only spend from contributions
-    for year in range(min(S.numyr, 59-S.retireage)):
-        row = [0] * nvars
-        for y in range(0, year-4):
-            row[n0+vper*y+3] = -1
-        for y in range(year+1):
-            row[n0+vper*y+2] = 1
-
-        # include contributions while working
-        for y in range(min(S.workyr, S.workyr-4+year)):
-            row[n1+vper*y+2] = -1
-
-        A += [row]
-        # only see initial balance after it has aged
-        contrib = 0
-        for (age, amount) in S.roth['contributions']:
-            if age + 5 - S.retireage <= year:
-                contrib += amount
-        b += [contrib]
-
+    year = np.arange(max(0, min(S.numyr, 59-S.retireage)))
+    (i1, y1) = _below(year.size, 1)                     # withdrawals
+    (i2, y2) = _below(year.size, -4)                    # aged conversions
+    # include contributions while working
+    (i3, y3) = _below(year.size, S.workyr-4, cap=S.workyr)
+    rows = np.concatenate([i1, i2, i3])
+    cols = np.concatenate([S.n0 + S.vper * y1 + 2,
+                           S.n0 + S.vper * y2 + 3,
+                           S.n1 + S.vper * y3 + 2])
+    vals = np.concatenate([np.ones(i1.size), -np.ones(i2.size), -np.ones(i3.size)])
+    # only see initial balance after it has aged
+    b = np.zeros(year.size)
+    for (age, amount) in S.roth['contributions']:
+        b[year >= age + 5 - S.retireage] += amount
+    return (year.size, rows, cols, vals, b)
+
+def _roth_block(S: Data, sepp: bool, T: Tables):
     # after 59 all of Roth can be spent, but contributions need to age
     # 5 years and the balance each year needs to be positive
-    for year in range(max(0,59-S.retireage),S.numyr+1):
-        row = [0] * nvars
-
-        # remove previous withdrawls
-        for y in range(year):
-            row[n0+vper*y+2] = S.r_rate ** (year - y)
-
-        # add previous conversions, but we can only see things
-        # converted more than 5 years ago
-        for y in range(year-5):
-            row[n0+vper*y+3] = -S.r_rate ** (year - y)
-
-        # add contributions from work period
-        for y in range(S.workyr):
-            row[n1+vper*y+2] = -S.r_rate ** (S.workyr + year - y)
-
-        A += [row]
-        # initial balance
-        b += [S.roth['bal'] * S.r_rate ** (S.workyr + year)]
-
-    # starting with age 70 the user must take RMD payments
-    for year in range(max(0,73-S.retireage),S.numyr):
-        row = [0] * nvars
-        age = year + S.retireage
-        rmd = RMD[age - 72]
-
-        # the gains from the initial balance minus any withdraws gives
-        # the current balance.
-        for y in range(year):
-            row[n0+vper*y+1] = -(S.r_rate ** (year - y))
-            row[n0+vper*y+3] = -(S.r_rate ** (year - y))
-            if year < S.sepp_end:
-                row[1] -= (1/S.sepp_ratio) * S.r_rate ** (year - y)
-
-        # include deposits during work years
-        for y in range(S.workyr):
-            row[n1+vper*y+1] = S.r_rate ** (S.workyr + year - y)
-
-        # this year's withdraw times the RMD factor needs to be more than
-        # the balance
-        row[n0+vper*year+1] = -rmd
-
-        A += [row]
-        b += [-(S.IRA['bal'] * S.r_rate ** (S.workyr + year))]
+    year0 = max(0, 59-S.retireage)
+    year = np.arange(year0, S.numyr+1)
+    now = T.G[S.workyr + year]
+    (i1, y1) = _below(year.size, year0)                 # previous withdrawls
+    # add previous conversions, but we can only see things
+    # converted more than 5 years ago
+    (i2, y2) = _below(year.size, year0 - 5)
+    # add contributions from work period
+    (i3, y3) = _below(year.size, S.workyr, slope=0)
+    rows = np.concatenate([i1, i2, i3])
+    cols = np.concatenate([S.n0 + S.vper * y1 + 2,
+                           S.n0 + S.vper * y2 + 3,
+                           S.n1 + S.vper * y3 + 2])
+    vals = np.concatenate([now[i1] / T.G[S.workyr + y1],
+                           -now[i2] / T.G[S.workyr + y2],
+                           -now[i3] / T.G[y3]])
+    # initial balance
+    b = S.roth['bal'] * now
+    return (year.size, rows, cols, vals, b)
+
+def _rmd_block(S: Data, sepp: bool, T: Tables):
+    # starting with age 73 the user must take RMD payments
+    year0 = max(0, 73-S.retireage)
+    year = np.arange(year0, S.numyr)
+    rmd = np.array(RMD)[year + S.retireage - 72]
+    now = T.G[S.workyr + year]
+
+    # the gains from the initial balance minus any withdraws gives
+    # the current balance.
+    (i1, y1) = _below(year.size, year0)
+    g = now[i1] / T.G[S.workyr + y1]
+    sepp_row = year < S.sepp_end
+    sepp_sum = np.bincount(i1, (1/S.sepp_ratio) * g, minlength=year.size)
+    # include deposits during work years
+    (i3, y3) = _below(year.size, S.workyr, slope=0)
+    i = np.arange(year.size)
+    rows = np.concatenate([i1, i1, i[sepp_row], i3, i])
+    cols = np.concatenate([S.n0 + S.vper * y1 + 1,
+                           S.n0 + S.vper * y1 + 3,
+                           np.ones(np.count_nonzero(sepp_row), dtype=int),
+                           S.n1 + S.vper * y3 + 1,
+                           # this year's withdraw times the RMD factor
+                           # needs to be more than the balance
+                           S.n0 + S.vper * year + 1])
+    vals = np.concatenate([-g, -g, -sepp_sum[sepp_row],
+                           now[i3] / T.G[y3],
+                           -rmd])
+    b = -(S.IRA['bal'] * now)
+    return (year.size, rows, cols, vals, b)
+
+_BLOCKS = [("sepp", _sepp_block),
+           ("work", _work_block),
+           ("brackets", _bracket_block),
+           ("savings", _savings_block),
+           ("ira", _ira_block),
+           ("sepp_end", _sepp_end_block),
+           ("roth59", _roth59_block),
+           ("roth", _roth_block),
+           ("rmd", _rmd_block)]
+
+# The "balance" formulation replaces the Roth and RMD blocks above,
+# where every row sums all earlier withdrawals, with explicit per-year
+# balance variables tied together by one-step recurrences:
+#   B[t+1] = r * (B[t] - IRA - IRA2ROTH - SEPP)    IRA balance
+#   V[t+1] = r * (V[t] - ROTH) + aged IRA2ROTH     Roth balance we can see
+#   C[t] = C[t-1] + ROTH - aged contributions      Roth spent before 59
+# so the number of nonzeros grows linearly with the number of years.
+# The balance variables go after the regular ones and are free.
+
+def _balance_vars(S: Data) -> tuple[int, int, int, int]:
+    """ Column of B[0], V[0], C[0] and the number of C variables """
+    nb = S.n1 + S.vper * (S.numyr + S.workyr)
+    nv = nb + S.numyr + 1
+    nc = nv + S.numyr + 1
+    return (nb, nv, nc, max(0, min(S.numyr, 59-S.retireage)))
+
+def _ira_bal_block(S: Data, sepp: bool, T: Tables):
+    # B[0] is the IRA balance plus work deposits at retirement
+    (nb, _, _, _) = _balance_vars(S)
+    work = np.arange(S.workyr)
+    year = np.arange(S.numyr)
+    g = T.G[S.workyr + year + 1] / T.G[S.workyr + year]
+    col = S.n0 + S.vper * year
+    sepp_yr = year[year < S.sepp_end]
+    rows = np.concatenate([[0], np.zeros_like(work), year+1, year+1, year+1,
+                           year+1, sepp_yr+1])
+    cols = np.concatenate([[nb], S.n1 + S.vper * work + 1, nb + year + 1,
+                           nb + year, col+1, col+3,
+                           np.ones_like(sepp_yr)])
+    vals = np.concatenate([[1], -T.G[S.workyr] / T.G[work], np.ones(S.numyr),
+                           -g, g, g, g[sepp_yr] / S.sepp_ratio])
+    b = np.zeros(S.numyr + 1)
+    b[0] = S.IRA['bal'] * T.G[S.workyr]
+    return (S.numyr + 1, rows, cols, vals, b)
+
+def _roth_bal_block(S: Data, sepp: bool, T: Tables):
+    # V[0] is the Roth balance plus work deposits at retirement,
+    # conversions can only be seen 5 years later
+    (_, nv, _, _) = _balance_vars(S)
+    work = np.arange(S.workyr)
+    year = np.arange(S.numyr)
+    g = T.G[S.workyr + year + 1] / T.G[S.workyr + year]
+    aged = year[year >= 5]
+    rows = np.concatenate([[0], np.zeros_like(work), year+1, year+1, year+1,
+                           aged+1])
+    cols = np.concatenate([[nv], S.n1 + S.vper * work + 2, nv + year + 1,
+                           nv + year, S.n0 + S.vper * year + 2,
+                           S.n0 + S.vper * (aged - 5) + 3])
+    vals = np.concatenate([[1], -T.G[S.workyr] / T.G[work], np.ones(S.numyr),
+                           -g, g,
+                           -T.G[S.workyr + aged + 1] / T.G[S.workyr + aged - 5]])
+    b = np.zeros(S.numyr + 1)
+    b[0] = S.roth['bal'] * T.G[S.workyr]
+    return (S.numyr + 1, rows, cols, vals, b)
+
+def _roth59_bal_block(S: Data, sepp: bool, T: Tables):
+    # C[t] is Roth withdrawals so far less conversions and work
+    # contributions old enough to spend
+    (_, _, nc, n59) = _balance_vars(S)
+    if n59 == 0:
+        return (0, [], [], [], [])
+    year = np.arange(n59)
+    later = year[1:]
+    aged = year[year >= 5]
+    first_work = np.arange(max(0, S.workyr-4))
+    # a work year contribution ages each year for the first 5 years
+    new_work = year[(year >= 1) & (year < 5) & (S.workyr-5+year >= 0)]
+    rows = np.concatenate([year, later, year, aged,
+                           np.zeros_like(first_work), new_work])
+    cols = np.concatenate([nc + year, nc + later - 1,
+                           S.n0 + S.vper * year + 2,
+                           S.n0 + S.vper * (aged - 5) + 3,
+                           S.n1 + S.vper * first_work + 2,
+                           S.n1 + S.vper * (S.workyr - 5 + new_work) + 2])
+    vals = np.concatenate([np.ones(n59), -np.ones(later.size), -np.ones(n59),
+                           np.ones(aged.size + first_work.size + new_work.size)])
+    return (n59, rows, cols, vals, np.zeros(n59))
+
+def _ira_final_block(S: Data, sepp: bool, T: Tables):
+    # final balance for IRA needs to be positive
+    (nb, _, _, _) = _balance_vars(S)
+    return (1, [0], [nb + S.numyr], [-1], [0])
 
+def _roth59_limit_block(S: Data, sepp: bool, T: Tables):
+    # before 59, Roth can only spend from contributions
+    (_, _, nc, n59) = _balance_vars(S)
+    year = np.arange(n59)
+    # only see initial balance after it has aged
+    b = np.zeros(n59)
+    for (age, amount) in S.roth['contributions']:
+        b[year >= age + 5 - S.retireage] += amount
+    return (n59, year, nc + year, np.ones(n59), b)
+
+def _roth_limit_block(S: Data, sepp: bool, T: Tables):
+    # after 59 the Roth balance each year needs to be positive
+    (_, nv, _, _) = _balance_vars(S)
+    year = np.arange(max(0, 59-S.retireage), S.numyr+1)
+    i = np.arange(year.size)
+    return (year.size, i, nv + year, -np.ones(year.size), np.zeros(year.size))
+
+def _rmd_limit_block(S: Data, sepp: bool, T: Tables):
+    # starting with age 73 this year's withdraw times the RMD factor
+    # needs to be more than the balance
+    (nb, _, _, _) = _balance_vars(S)
+    year = np.arange(max(0, 73-S.retireage), S.numyr)
+    rmd = np.array(RMD)[year + S.retireage - 72]
+    i = np.arange(year.size)
+    # The sum formulation leaves SEPP payments out of the balance
+    # once SEPP has ended, add them back so both give the same plan.
+    late = year >= S.sepp_end
+    sepp_yr = np.arange(min(S.sepp_end, S.numyr))
+    back = (T.G[S.workyr + year[late], None] / T.G[S.workyr + sepp_yr]).sum(axis=1)
+    rows = np.concatenate([i, i, i[late]])
+    cols = np.concatenate([nb + year, S.n0 + S.vper * year + 1,
+                           np.ones(np.count_nonzero(late), dtype=int)])
+    vals = np.concatenate([np.ones(year.size), -rmd, back / S.sepp_ratio])
+    return (year.size, rows, cols, vals, np.zeros(year.size))
+
+_BALANCE_BLOCKS = [("sepp", _sepp_block),
+                   ("work", _work_block),
+                   ("brackets", _bracket_block),
+                   ("savings", _savings_block),
+                   ("ira", _ira_final_block),
+                   ("sepp_end", _sepp_end_block),
+                   ("roth59", _roth59_limit_block),
+                   ("roth", _roth_limit_block),
+                   ("rmd", _rmd_limit_block)]
+
+_BALANCE_EQ_BLOCKS = [("ira_bal", _ira_bal_block),
+                      ("roth_bal", _roth_bal_block),
+                      ("roth59_bal", _roth59_bal_block)]
+
+# formulation name -> (A_ub blocks, A_eq blocks)
+FORMULATIONS = {'sum': (_BLOCKS, []),
+                'balance': (_BALANCE_BLOCKS, _BALANCE_EQ_BLOCKS)}
+
+def _assemble(S: Data, sepp: bool, blocklist: list, T: Tables,
+              spans: dict | None = None):
+    """ Blocks as COO triplets: (nrows, rows, cols, vals, b, blocks)
+
+    spans, when given, gets where each block's entries are in vals.
+    """
+    (rows, cols, vals, b) = ([np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)],
+                             [np.zeros(0)], [np.zeros(0)])
+    blocks = {}
+    nrows = 0
+    nvals = 0
+    for (name, block) in blocklist:
+        (n, r, col, v, rhs) = block(S, sepp, T)
+        blocks[name] = slice(nrows, nrows + n)
+        if spans is not None:
+            spans[name] = slice(nvals, nvals + len(v))
+            nvals += len(v)
+        rows.append(np.asarray(r, dtype=int) + nrows)
+        cols.append(np.asarray(col, dtype=int))
+        vals.append(np.asarray(v, dtype=float))
+        b.append(np.asarray(rhs, dtype=float))
+        nrows += n
+    return (nrows, np.concatenate(rows), np.concatenate(cols),
+            np.concatenate(vals), np.concatenate(b), blocks)
+
+def _tables(S: Data, returns, inflation) -> Tables:
+    """ S.tables unless the rates are replaced by yearly sequences """
+    if returns is None and inflation is None:
+        return S.tables
+    return Tables(S, returns, inflation)
+
+def _nvars(S: Data, formulation: str) -> int:
+    if formulation == 'balance':
+        (_, _, nc, n59) = _balance_vars(S)
+        return nc + n59
+    return S.n1 + S.vper * (S.numyr + S.workyr)
+
+def _objective(S: Data, formulation: str) -> np.ndarray:
+    c = np.zeros(_nvars(S, formulation))
+    c[0] = -1       # optimize this poly (we want to maximize the money we can spend)
+    return c
+
+def _bounds(S: Data, formulation: str) -> np.ndarray | None:
+    if formulation == 'sum':
+        return None                     # all vars positive
+    bounds = np.zeros((_nvars(S, formulation), 2))
+    bounds[:, 1] = np.inf
+    bounds[_balance_vars(S)[0]:, 0] = -np.inf
+    return bounds
+
+def build_model(S: Data, sepp: bool, returns=None, inflation=None,
+                formulation: str = 'sum') -> Model:
+    """ Assemble the LP directly as a sparse matrix
+
+    returns and inflation are passed to Tables, formulation is one of
+    FORMULATIONS.
+    """
+    import scipy.sparse
+    (ub_blocks, eq_blocks) = FORMULATIONS[formulation]
+    T = _tables(S, returns, inflation)
+    c = _objective(S, formulation)
+
+    (nrows, rows, cols, vals, b, blocks) = _assemble(S, sepp, ub_blocks, T)
+    A = scipy.sparse.coo_array((vals, (rows, cols)),
+                               shape=(nrows, len(c))).tocsr()
+    M = Model(c, A, b, blocks, bounds=_bounds(S, formulation))
+    if eq_blocks:
+        (nrows, rows, cols, vals, M.b_eq, M.eq_blocks) = \
+            _assemble(S, sepp, eq_blocks, T)
+        M.A_eq = scipy.sparse.coo_array((vals, (rows, cols)),
+                                        shape=(nrows, len(c))).tocsr()
+    return M
+
+def taxable_bound(S: Data, T: Tables) -> np.ndarray:
+    """ Most taxable income each retirement year could possibly have
+
+    Whatever the rest of the plan does, IRA withdrawals, conversions and
+    SEPP income in one year can't exceed the IRA balance grown with
+    every work year contributing the most it is allowed.
+    """
+    now = T.G[S.workyr + np.arange(S.numyr)]
+    ira = S.IRA['bal'] * now
+    if S.workyr > 0:
+        y = np.arange(S.workyr)
+        contrib = S.IRA['maxcontrib'] * T.I[y]
+        if S.maxsave_inflation:
+            contrib = np.minimum(contrib, S.maxsave * T.I[y])
+        else:
+            contrib = np.minimum(contrib, S.maxsave)
+        ira += now * np.sum(contrib / T.G[y])
+    return ira + np.asarray(S.taxed) - S.stded * T.i_mul
+
+def presolve(S: Data, M: Model, T: Tables) -> Model:
+    """ Drop bracket rows that can never bind, M is changed in place
+
+    Bracket row k says spending plus tax figured as if all taxable
+    income were at rate k fits in the budget.  With increasing rates
+    the row for the bracket below is at least as strict whenever the
+    taxable income can't reach cut k, so those rows go.  The number of
+    rows removed is left in M.presolved.
+    """
+    cut = np.array([x for (x, _) in S.taxrates])
+    if np.any(np.diff(cut) < 0) or np.any(np.diff(T.rate) < 0):
+        return M
+    reach = taxable_bound(S, T)
+    # small margin so rounding in the bound never drops a live row
+    drop = T.cut >= (reach + np.abs(reach) * 1e-9 + 1)[:, None]
+    drop[:, 0] = False
+    keep = np.ones(M.A_ub.shape[0], dtype=bool)
+    keep[M.blocks['brackets']] = ~drop.ravel()          # year major
+    if keep.all():
+        return M
+
+    idx = np.flatnonzero(keep)
+    M.A_ub = M.A_ub[idx]
+    M.b_ub = M.b_ub[idx]
+    before = np.concatenate([[0], np.cumsum(keep)])
+    M.blocks = {k: slice(before[r.start], before[r.stop])
+                for (k, r) in M.blocks.items()}
+    M.presolved += keep.size - idx.size
+    return M
+
+def plan_shape(S: Data, sepp: bool, formulation: str = 'sum') -> tuple:
+    """ Plans with the same shape give LPs with the same sparsity pattern """
+    return (S.vper, S.n1, S.workyr, S.numyr, S.retireage, S.sepp_end,
+            len(S.taxrates), sepp, formulation)
+
+def _compile(nrows: int, rows: np.ndarray, cols: np.ndarray,
+             vals: np.ndarray, ncols: int):
+    """ CSR matrix for the triplets and where each triplet lands in A.data """
+    import scipy.sparse
+    # tag each entry with its position so we learn the CSR order
+    A = scipy.sparse.coo_array((np.arange(1.0, vals.size + 1), (rows, cols)),
+                               shape=(nrows, ncols)).tocsr()
+    if A.nnz != vals.size:
+        raise ValueError("duplicate entries in model")
+    order = A.data.astype(np.intp) - 1
+    A.data[:] = vals[order]
+    return (A, order)
+
+class ModelTemplate:
+    """ The LP structure for one plan shape, compiled once
+
+    update() patches the coefficients and right hand side for another
+    plan of the same shape (different returns, inflation, balances,
+    income, ...) into the same arrays instead of rebuilding the matrix.
+    update_blocks() does the same for only some of the blocks.
+    """
+    def __init__(self, S: Data, sepp: bool, formulation: str = 'sum'):
+        self.shape = plan_shape(S, sepp, formulation)
+        self.sepp = sepp
+        self.formulation = formulation
+        (ub_blocks, eq_blocks) = FORMULATIONS[formulation]
+        T = S.tables
+        c = _objective(S, formulation)
+        self._spans = {}        # block name -> its entries in _vals/_eq_vals
+
+        (nrows, rows, cols, self._vals, b, blocks) = \
+            _assemble(S, sepp, ub_blocks, T, self._spans)
+        (A, self._order) = _compile(nrows, rows, cols, self._vals, len(c))
+        self.model = Model(c, A, b, blocks, bounds=_bounds(S, formulation))
+        (self._eq_vals, self._eq_order) = (None, None)
+        if eq_blocks:
+            (nrows, rows, cols, self._eq_vals, self.model.b_eq, self.model.eq_blocks) = \
+                _assemble(S, sepp, eq_blocks, T, self._spans)
+            (self.model.A_eq, self._eq_order) = \
+                _compile(nrows, rows, cols, self._eq_vals, len(c))
+
+    def _check_shape(self, S: Data) -> None:
+        shape = plan_shape(S, self.sepp, self.formulation)
+        if shape != self.shape:
+            raise ValueError("plan shape %s does not match template %s" %
+                             (shape, self.shape))
+
+    def update(self, S: Data, returns=None, inflation=None,
+               tables: Tables | None = None) -> Model:
+        """ Patch in the numbers for S, the returned Model is shared
+
+        tables, when given, replaces the ones from returns and inflation.
+        """
+        self._check_shape(S)
+        (ub_blocks, eq_blocks) = FORMULATIONS[self.formulation]
+        T = _tables(S, returns, inflation) if tables is None else tables
+        (_, _, _, self._vals, b, _) = _assemble(S, self.sepp, ub_blocks, T)
+        np.take(self._vals, self._order, out=self.model.A_ub.data)
+        self.model.b_ub[:] = b
+        if eq_blocks:
+            (_, _, _, self._eq_vals, b, _) = _assemble(S, self.sepp, eq_blocks, T)
+            np.take(self._eq_vals, self._eq_order, out=self.model.A_eq.data)
+            self.model.b_eq[:] = b
+        return self.model
+
+    def update_blocks(self, S: Data, names) -> Model:
+        """ update() for S.tables, recomputing only the named blocks
+
+        Only right when what changed since the last update can't
+        affect the other blocks.
+        """
+        self._check_shape(S)
+        (ub_blocks, eq_blocks) = FORMULATIONS[self.formulation]
+        M = self.model
+        for (blocklist, vals, order, A, b, rows) in [
+                (ub_blocks, self._vals, self._order, M.A_ub, M.b_ub, M.blocks),
+                (eq_blocks, self._eq_vals, self._eq_order, M.A_eq, M.b_eq, M.eq_blocks)]:
+            todo = [(name, block) for (name, block) in blocklist if name in names]
+            for (name, block) in todo:
+                (_, _, _, v, rhs) = block(S, self.sepp, S.tables)
+                vals[self._spans[name]] = v
+                b[rows[name]] = rhs
+            if todo:
+                np.take(vals, order, out=A.data)
+        return M
+
+    def solve(self, S: Data, returns=None, inflation=None,
+              verbose: bool = False, method: str | None = None,
+              tables: Tables | None = None) -> np.ndarray:
+        with perf.phase('update'):
+            M = self.update(S, returns, inflation, tables)
+        return solve_model(M, verbose, method).x
+
+# used by solve_model() when no method is given, see backends.METHODS
+DEFAULT_METHOD = 'highs-ipm'
+
+def _import_solver(method: str | None) -> None:
+    """ Import scipy (and highspy) in a phase of their own, so the first
+    build and solve times are the model's and the solver's alone """
+    todo = backends.unimported(method or DEFAULT_METHOD)
+    if todo:
+        with perf.phase('import'):
+            for name in todo:
+                importlib.import_module(name)
+
+def solve(S: Data, sepp: bool, verbose: bool = False,
+          returns=None, inflation=None, formulation: str = 'sum',
+          presolve_brackets: bool = True, method: str | None = None) -> np.ndarray:
+    """ Spending-maximizing plan for S, raises SolveError if there is none """
+    _import_solver(method)
+    with perf.phase('build'):
+        M = build_model(S, sepp, returns, inflation, formulation)
+    if presolve_brackets:
+        with perf.phase('presolve'):
+            presolve(S, M, _tables(S, returns, inflation))
+        if verbose:
+            print("Presolve removed %d bracket rows" % M.presolved)
+    perf.record_model(M)
+    return solve_model(M, verbose, method).x
+
+def solve_model(M: Model, verbose: bool = False,
+                method: str | None = None) -> 'scipy.optimize.OptimizeResult':
+    """ Run the solver on M, the result keeps the dual values """
     if verbose:
-        print("Num vars: ", len(c))
-        print("Num contraints: ", len(b))
-    res = scipy.optimize.linprog(c, A_ub=A, b_ub=b, method="highs-ipm", options={"disp": verbose})
+        nnz = M.A_ub.nnz
+        ncons = M.A_ub.shape[0]
+        if M.A_eq is not None:
+            nnz += M.A_eq.nnz
+            ncons += M.A_eq.shape[0]
+        print("Num vars: ", len(M.c))
+        print("Num contraints: ", ncons)
+        print("Num nonzeros: ", nnz)
+    _import_solver(method)
+    start = time.perf_counter()
+    with perf.phase('solve'):
+        (res, method) = backends.run(method or DEFAULT_METHOD, M.c, M.A_ub, M.b_ub,
+                                     M.A_eq, M.b_eq, M.bounds, verbose)
+    perf.record_solver(res, method, time.perf_counter() - start)
     if res.success == False:
-        print(res)
-        exit(1)
-
-    return res.x
+        raise _solve_error(res)
+
+    return res
+
+class Solution:
+    """ Named views into a solved plan's variables, nothing is copied
+
+    x is the LP solution.  work is one row per work year and years one
+    row per retirement year, each with the vper variables of that year,
+    so the named columns below are strided views into x.
+    """
+    __slots__ = ('x', 'work', 'years')
+
+    def __init__(self, S: Data, x: np.ndarray):
+        self.x = np.asarray(x, dtype=float)
+        self.work = self.x[S.n1:S.n0].reshape(S.workyr, S.vper)
+        self.years = self.x[S.n0:S.n0 + S.numyr * S.vper].reshape(S.numyr, S.vper)
+
+    @property
+    def goal(self) -> float:
+        return self.x[0]
+
+    @property
+    def principal(self) -> float:
+        """ IRA money reserved for SEPP """
+        return self.x[1]
+
+    @property
+    def savings_withdraw(self) -> np.ndarray:
+        return self.years[:, 0]
+
+    @property
+    def ira_withdraw(self) -> np.ndarray:
+        return self.years[:, 1]
+
+    @property
+    def roth_withdraw(self) -> np.ndarray:
+        return self.years[:, 2]
+
+    @property
+    def ira_to_roth(self) -> np.ndarray:
+        return self.years[:, 3]
+
+    @property
+    def savings_contrib(self) -> np.ndarray:
+        return self.work[:, 0]
+
+    @property
+    def ira_contrib(self) -> np.ndarray:
+        return self.work[:, 1]
+
+    @property
+    def roth_contrib(self) -> np.ndarray:
+        return self.work[:, 2]
+
+WORK_FIELDS = ['age', 'savings', 'fsavings', 'ira', 'fira', 'roth', 'froth']
+YEAR_FIELDS = ['age', 'savings', 'fsavings', 'ira', 'fira', 'sepp', 'roth',
+               'froth', 'ira2roth', 'rate', 'tax', 'spend', 'extra',
+               'income', 'expense']
+
+class Ledger:
+    """ Per-year balances and money flows of a solved plan
+
+    work and years are NumPy structured arrays with WORK_FIELDS and
+    YEAR_FIELDS columns, one row per work year and retirement year.
+    Balances are at the start of the year.  sepp is the yearly SEPP
+    amount after rounding the reserved principal down to $100.
+    """
+    def __init__(self, goal: float, sepp: float, work: np.ndarray,
+                 years: np.ndarray):
+        self.goal = goal
+        self.sepp = sepp
+        self.work = work
+        self.years = years
+
+    @property
+    def total_spend(self) -> float:
+        return float(np.sum(self.years['spend'] + self.years['extra']))
+
+    @property
+    def total_tax(self) -> float:
+        return float(np.sum(self.years['tax']))
+
+    def to_dict(self) -> dict:
+        """ Plain Python types, ready for json.dumps() """
+        def rows(a: np.ndarray) -> list[dict]:
+            return [dict(zip(a.dtype.names, r)) for r in a.tolist()]
+        return {'goal': float(self.goal),
+                'sepp': float(self.sepp),
+                'total_spend': self.total_spend,
+                'total_tax': self.total_tax,
+                'work': rows(self.work),
+                'years': rows(self.years)}
+
+def _balances(start: float, flow: np.ndarray, G: np.ndarray) -> np.ndarray:
+    """ Start of year balances when flow[y] is added each year then grows
+
+    G is the growth from the first year, one longer than flow.
+    """
+    return G * (start + np.concatenate([[0], np.cumsum(flow / G[:-1])]))
+
+def ledger(S: Data, res: np.ndarray, T: Tables | None = None) -> Ledger:
+    """ Replay the plan in res as a table, all years at once
+
+    T replaces S.tables, e.g. to replay the plan through other rates.
+    """
+    P = Solution(S, res)
+    sepp = 100*int(P.principal/100)
+    T = S.tables if T is None else T
+    G_work = T.G[:S.workyr + 1]
+    G_ret = T.G[S.workyr:S.workyr + S.numyr + 1] / T.G[S.workyr]
+
+    work = np.zeros(S.workyr, dtype=[(k, float) for k in WORK_FIELDS])
+    work['age'] = S.startage + np.arange(S.workyr)
+    (work['fsavings'], work['fira'], work['froth']) = \
+        (P.savings_contrib, P.ira_contrib, P.roth_contrib)
+    savings = _balances(S.aftertax['bal'], P.savings_contrib, G_work)
+    ira = _balances(S.IRA['bal'], P.ira_contrib, G_work)
+    roth = _balances(S.roth['bal'], P.roth_contrib, G_work)
+    (work['savings'], work['ira'], work['roth']) = (savings[:-1], ira[:-1], roth[:-1])
+
+    L = np.zeros(S.numyr, dtype=[(k, float) for k in YEAR_FIELDS])
+    year = np.arange(S.numyr)
+    i_mul = T.i_mul
+    L['age'] = S.retireage + year
+    (L['fsavings'], L['fira'], L['froth'], L['ira2roth']) = P.years.T
+    L['sepp'] = np.where(year < S.sepp_end, sepp / S.sepp_ratio, 0)
+    L['income'] = S.income
+    L['expense'] = S.expenses
+
+    L['savings'] = _balances(savings[-1], -L['fsavings'], G_ret)[:-1]
+    L['ira'] = _balances(ira[-1], -(L['fira'] + L['sepp'] + L['ira2roth']),
+                         G_ret)[:-1]
+    L['roth'] = _balances(roth[-1], L['ira2roth'] - L['froth'], G_ret)[:-1]
+
+    # find the highest bracket below this year's taxable income
+    inc = L['fira'] + L['ira2roth'] - S.stded*i_mul + S.taxed + L['sepp']
+    inc = np.maximum(inc, 0)
+    k = np.sum(T.cut < inc[:, None], axis=1) - 1
+    below = k < 0
+    k = np.maximum(k, 0)
+    L['rate'] = np.where(below, 0, T.rate[k])
+    tax = np.where(below, 0,
+                   (inc - T.cut[year, k]) * T.rate[k] + T.base[year, k])
+    tax += L['fsavings'] * T.basis * (cg_tax + S.state_cg_tax)
+    tax += np.where(S.retireage + year < 59, L['fira'] * 0.10, 0)
+    L['tax'] = tax
+    L['extra'] = L['expense'] - L['income']
+    L['spend'] = (L['fsavings'] + L['fira'] + L['froth'] - L['tax']
+                  - L['extra'] + L['sepp'])
+    return Ledger(P.goal, sepp, work, L)
 
 def print_ascii(S: Data, res: list[float]) -> None:
-    print("Yearly spending <= ", 100*int(res[0]/100))
-    sepp = 100*int(res[1]/100)
-    print("SEPP amount = ", sepp, sepp / S.sepp_ratio)
+    P = ledger(S, res)
+    print("Yearly spending <= ", 100*int(P.goal/100))
+    print("SEPP amount = ", P.sepp, P.sepp / S.sepp_ratio)
     print()
-    savings = S.aftertax['bal']
-    ira = S.IRA['bal']
-    roth = S.roth['bal']
     if S.workyr > 0:
         print((" age" + " %5s" * 6) %
               ("save", "tSAVE", "IRA", "tIRA", "Roth", "tRoth"))
-    for year in range(S.workyr):
-        fsavings = res[S.n1+year*S.vper]
-        fira = res[S.n1+year*S.vper+1]
-        froth = res[S.n1+year*S.vper+2]
+    for row in P.work:
         print((" %d:" + " %5.0f" * 6) %
-              (year+S.startage,
-               savings/1000, fsavings/1000,
-               ira/1000, fira/1000,
-               roth/1000, froth/1000))
-        savings += fsavings
-        savings *= S.r_rate
-        ira += fira
-        ira *= S.r_rate
-        roth += froth
-        roth *= S.r_rate
+              (row['age'],
+               row['savings']/1000, row['fsavings']/1000,
+               row['ira']/1000, row['fira']/1000,
+               row['roth']/1000, row['froth']/1000))
 
     print((" age" + " %5s" * 12) %
           ("save", "spend", "IRA", "fIRA", "SEPP", "Roth", "fRoth", "IRA2R",
            "rate", "tax", "spend", "extra"))
-    ttax = 0.0
-    tspend = 0.0
-    for year in range(S.numyr):
-        i_mul = S.i_rate ** (year + S.workyr)
-        fsavings = res[S.n0+year*S.vper]
-        fira = res[S.n0+year*S.vper+1]
-        froth = res[S.n0+year*S.vper+2]
-        ira2roth = res[S.n0+year*S.vper+3]
-        if year < S.sepp_end:
-            sepp_spend = sepp/S.sepp_ratio
-        else:
-            sepp_spend = 0
-        inc = fira + ira2roth - S.stded*i_mul + S.taxed[year] + sepp_spend
-
-        #if S.income[year]:
-        #    savings += S.income[year]
-
-        (c, r, b) = (0, 0, 0)
-        if inc < 0:
-            inc = 0
-
-        (taxbase, last_cut, last_rate) = (b, c, r)
-        for (cut, rate) in S.taxrates:
-            if rate > 0:
-                rate += S.state_tax
-            taxbase += (cut - last_cut) * last_rate * i_mul
-            (last_cut, last_rate) = (cut, rate)
-            base = taxbase
-            cut *= i_mul
-            if inc <= cut:
-                break
-            c = cut
-            r = rate
-            b = base
-        (cut, rate, base) = (c, r, b)
-        tax = (inc - cut) * rate + base
-
-        # aftertax basis
-        if S.aftertax['basis'] > 0:
-            basis = 1 - (S.aftertax['basis'] /
-                         (S.aftertax['bal']*S.r_rate**(year + S.workyr)))
-        else:
-            basis = 1
-        tax += fsavings * basis * (cg_tax + S.state_cg_tax)
-        if S.retireage + year < 59:
-            tax += fira * 0.10
-        ttax += tax
-        extra = S.expenses[year] - S.income[year]
-        spending = fsavings + fira + froth - tax - extra + sepp_spend
-
-        tspend += spending + extra
+    for row in P.years:
         print((" %d:" + " %5.0f" * 12) %
-              (year+S.retireage,
-               savings/1000, fsavings/1000,
-               ira/1000, fira/1000, sepp_spend/1000,
-               roth/1000, froth/1000, ira2roth/1000,
-               rate * 100, tax/1000, spending/1000, extra/1000))
-
-        savings -= fsavings
-        savings *= S.r_rate
-        ira -= fira + sepp_spend + ira2roth
-        ira *= S.r_rate
-        roth -= froth
-        roth += ira2roth
-        roth *= S.r_rate
-
-    print("\ntotal spending: %.0f" % tspend)
-    print("total tax: %.0f (%.1f%%)" % (ttax, 100*ttax/tspend))
+              (row['age'],
+               row['savings']/1000, row['fsavings']/1000,
+               row['ira']/1000, row['fira']/1000, row['sepp']/1000,
+               row['roth']/1000, row['froth']/1000, row['ira2roth']/1000,
+               row['rate'] * 100, row['tax']/1000, row['spend']/1000,
+               row['extra']/1000))
+
+    print("\ntotal spending: %.0f" % P.total_spend)
+    print("total tax: %.0f (%.1f%%)" % (P.total_tax, 100*P.total_tax/P.total_spend))
 
 def print_csv(S: Data, res: list[float]) -> None:
-    print("spend goal,%d" % res[0])
+    P = ledger(S, res)
+    print("spend goal,%d" % P.goal)
     print("savings,%d,%d" % (S.aftertax['bal'], S.aftertax['basis']))
     print("ira,%d" % S.IRA['bal'])
     print("roth,%d" % S.roth['bal'])
 
     print("age,spend,fIRA,fROTH,IRA2R,income,expense")
-    for year in range(S.numyr):
-        fsavings = res[S.n0+year*S.vper]
-        fira = res[S.n0+year*S.vper+1]
-        froth = res[S.n0+year*S.vper+2]
-        ira2roth = res[S.n0+year*S.vper+3]
-        print(("%d," * 6 + "%d") % (year+S.retireage,fsavings,fira,froth,ira2roth,
-                                    S.income[year],S.expenses[year]))
+    for row in P.years:
+        print(("%d," * 6 + "%d") % (row['age'], row['fsavings'], row['fira'],
+                                    row['froth'], row['ira2roth'],
+                                    row['income'], row['expense']))
+
+# subcommands, each is a module in this package with a main(argv)
+COMMANDS = ['sweep', 'montecarlo', 'serve', 'sensitivity', 'validate',
+            'frontier', 'goalseek', 'backtest', 'robust', 'check', 'snapshot',
+            'watch']
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        cmd = importlib.import_module('.' + sys.argv[1], __package__)
+        return cmd.main(sys.argv[2:])
+
     # Instantiate the parser
     parser = argparse.ArgumentParser()
     parser.add_argument('-v', '--verbose', action='store_true',
@@ -490,22 +1112,73 @@ def main():
                         help="Enable SEPP processing")
     parser.add_argument('--csv', action='store_true', help="Generate CSV outputs")
     parser.add_argument('--validate', action='store_true',
-                        help="compare single run to separate runs")
-    parser.add_argument('conffile')
+                        help="replay the plan year by year and check every rule")
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='sum',
+                        help="sum: balances as sums of all earlier years, "
+                        "balance: per-year balance variables (smaller for "
+                        "long plans)")
+    parser.add_argument('--solver', choices=backends.METHODS, default=DEFAULT_METHOD,
+                        help="LP method, auto picks one from the model size "
+                        "(default %(default)s)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always run the solver, don't use cached results")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Remove all cached results")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write per-phase timing, memory and model "
+                        "stats as JSON to stderr")
+    parser.add_argument('conffile', nargs='?')
     args = parser.parse_args()
 
+    if args.profile:
+        with perf.Profiler() as prof:
+            prof.info['conffile'] = args.conffile
+            run(parser, args)
+        print(prof.to_json(), file=sys.stderr)
+    else:
+        run(parser, args)
+
+def run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """ The main command once arguments are parsed """
+    from .cache import Cache, cached_solve
+    cache = Cache()
+    if args.clear_cache:
+        cache.clear()
+        if not args.conffile:
+            return
+    if not args.conffile:
+        parser.error("the following arguments are required: conffile")
+
     S = Data()
     S.load_file(args.conffile)
 
-    res = solve(S, args.sepp, args.verbose)
-    if args.csv:
-        print_csv(S, res)
-    else:
-        print_ascii(S, res)
+    try:
+        if args.no_cache:
+            res = solve(S, args.sepp, args.verbose, formulation=args.formulation,
+                        method=args.solver)
+        else:
+            res = cached_solve(S, args.sepp, args.verbose, cache, args.formulation,
+                               args.solver)
+    except SolveError as e:
+        print(e.res)
+        exit(1)
+    with perf.phase('render'):
+        if args.csv:
+            print_csv(S, res)
+        else:
+            print_ascii(S, res)
 
     if args.validate:
-        for y in range(1,nyears):
-            pass
+        from .validate import check, print_issues
+        with perf.phase('validate'):
+            issues = check(S, res)
+        print()
+        print_issues(issues)
+        if issues:
+            exit(1)
+
+# when this module finished loading, see fplan check
+loaded = time.perf_counter()
 
 if __name__== "__main__":
     main()
@@ -0,0 +1,158 @@
+"""Tradeoff curves between spending, estate and retirement age
+
+    fplan frontier plan.toml --estate 0:2000000:100000
+    fplan frontier plan.toml --spend 60000:120000:5000
+    fplan frontier plan.toml --workyears 0:10:1
+
+--estate steps a floor on the final balance of all accounts (in
+today's dollars) and reports the most spending each floor allows,
+--spend fixes the yearly spending and reports the largest estate left.
+Both keep one LP loaded and only move a bound between points, so with
+highspy installed each point is a warm started re-solve (see
+backends.Parametric).  --workyears changes the shape of the LP, so
+those points are independent solves run in a process pool.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import sys
+
+import numpy as np
+import scipy.sparse
+
+from . import backends
+from .fplan import (FORMULATIONS, Data, Model, SolveError, build_model, load_config,
+                    presolve, solve_model)
+from .sweep import apply_overrides, parse_grid
+
+
+def add_estate_row(S: Data, M: Model) -> float:
+    """ Append an 'estate' row to M: money left at the end <= its rhs
+
+    The row is the sum of the savings, IRA and Roth final balance rows,
+    so with rhs b the estate is b - row @ x.  Returns the inflation
+    multiplier to today's dollars at the end of the plan.
+    """
+    last = [M.blocks['savings'].start, M.blocks['ira'].start, M.blocks['roth'].stop - 1]
+    row = scipy.sparse.csr_array(M.A_ub[last].sum(axis=0).reshape(1, -1))
+    n = M.A_ub.shape[0]
+    M.A_ub = scipy.sparse.vstack([M.A_ub, row], format='csr')
+    M.b_ub = np.append(M.b_ub, M.b_ub[last].sum())
+    M.blocks['estate'] = slice(n, n + 1)
+    return S.tables.I[S.workyr + S.numyr]
+
+def _estate(M: Model, x: np.ndarray, i_end: float, total: float) -> float:
+    """ Final balance of all accounts in today's dollars """
+    row = M.blocks['estate'].start
+    return float((total - M.A_ub[[row]] @ x)[0] / i_end)
+
+def _model(S: Data, sepp: bool, formulation: str) -> tuple[Model, float, float]:
+    M = build_model(S, sepp, formulation=formulation)
+    presolve(S, M, S.tables)
+    i_end = add_estate_row(S, M)
+    return (M, i_end, M.b_ub[-1])
+
+def _point(key: str, value, res) -> dict:
+    if res.status != 0:
+        return {key: value, 'status': 'failed', 'message': res.message}
+    return {key: value, 'status': 'ok', 'iterations': int(res.nit or 0)}
+
+def estate_frontier(S: Data, floors: list[float], sepp: bool = False,
+                    formulation: str = 'sum') -> list[dict]:
+    """ Most spending for each estate floor (today's dollars) """
+    (M, i_end, total) = _model(S, sepp, formulation)
+    lp = backends.Parametric(M.c, M.A_ub, M.b_ub, M.A_eq, M.b_eq, M.bounds)
+    row = M.blocks['estate'].start
+    table = []
+    for floor in floors:
+        lp.set_row_upper(row, total - floor * i_end)
+        res = lp.solve()
+        p = _point('estate_floor', floor, res)
+        if res.status == 0:
+            p.update(spend=res.x[0], estate=_estate(M, res.x, i_end, total))
+        table.append(p)
+    return table
+
+def spend_frontier(S: Data, goals: list[float], sepp: bool = False,
+                   formulation: str = 'sum') -> list[dict]:
+    """ Largest estate (today's dollars) left with each yearly spending """
+    (M, i_end, total) = _model(S, sepp, formulation)
+    row = M.blocks['estate'].start
+    # maximize the estate: minimize the estate row
+    c = M.A_ub[[row]].toarray().ravel()
+    lp = backends.Parametric(c, M.A_ub, M.b_ub, M.A_eq, M.b_eq, M.bounds)
+    table = []
+    for goal in goals:
+        lp.set_col_bounds(0, goal, goal)
+        res = lp.solve()
+        p = _point('spend', goal, res)
+        if res.status == 0:
+            p.update(spend=goal, estate=_estate(M, res.x, i_end, total))
+        table.append(p)
+    return table
+
+def _workyears_point(d: dict, years: int, sepp: bool, formulation: str) -> dict:
+    try:
+        S = Data()
+        S.load(apply_overrides(d, {'prep.workyears': years}))
+        (M, i_end, total) = _model(S, sepp, formulation)
+        res = solve_model(M)
+    except SolveError as e:
+        return _point('workyears', years, e.res)
+    except Exception as e:
+        return {'workyears': years, 'status': 'error',
+                'message': "%s: %s" % (type(e).__name__, e)}
+    p = _point('workyears', years, res)
+    p.update(retireage=S.retireage, spend=res.x[0],
+             estate=_estate(M, res.x, i_end, total))
+    return p
+
+def workyears_frontier(d: dict, years: list[int], sepp: bool = False,
+                       formulation: str = 'sum', jobs: int | None = None) -> list[dict]:
+    """ Spending and estate for each number of work years, config dict d """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_workyears_point, [d] * len(years), years,
+                             [sepp] * len(years), [formulation] * len(years)))
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan frontier")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--estate', metavar='START:STOP:STEP',
+                       help="estate floors in today's dollars (or v1,v2,...)")
+    group.add_argument('--spend', metavar='START:STOP:STEP',
+                       help="yearly spending goals (or v1,v2,...)")
+    group.add_argument('--workyears', metavar='START:STOP:STEP',
+                       help="years of work before retiring (or v1,v2,...)")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='sum')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes for --workyears (default: all cores)")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    d = load_config(args.conffile)
+    (key, spec) = next((k, v) for (k, v) in [('estate_floor', args.estate),
+                                              ('spend', args.spend),
+                                              ('workyears', args.workyears)] if v)
+    try:
+        (_, values) = parse_grid('x=' + spec)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if key == 'workyears':
+        table = workyears_frontier(d, values, args.sepp, args.formulation, args.jobs)
+    else:
+        S = Data()
+        S.load(d)
+        curve = estate_frontier if key == 'estate_floor' else spend_frontier
+        table = curve(S, values, args.sepp, args.formulation)
+
+    out = csv.writer(sys.stdout)
+    out.writerow([key, 'status', 'spend', 'estate'])
+    for p in table:
+        if p['status'] == 'ok':
+            out.writerow([p[key], 'ok', round(p['spend']), round(p['estate'])])
+        else:
+            out.writerow([p[key], "%s: %s" % (p['status'], p['message']), '', ''])
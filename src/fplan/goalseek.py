@@ -0,0 +1,144 @@
+"""Find the threshold that still pays for a spending floor
+
+    fplan goalseek plan.toml --spend 90000                    # fewest work years
+    fplan goalseek plan.toml --spend 90000 --param maxsave    # least saving
+    fplan goalseek plan.toml --spend 90000 --param endage     # latest end age
+
+The spending goal becomes a lower bound on the goal column, so each
+probe only asks whether the LP is feasible.  Feasibility is monotone in
+each parameter (more work years or saving only help, a later end age
+only hurts), so bisection finds the threshold in O(log n) solves.  The
+config is parsed once and maxsave probes share the loaded Data and its
+tables; work years and end age change the plan's shape and reload.
+"""
+
+import argparse
+import copy
+
+import numpy as np
+
+from .fplan import (Data, SolveError, build_model, load_config, presolve,
+                    print_ascii, solve_model)
+from .sweep import apply_overrides
+
+# param -> (config key, step, more is better)
+PARAMS = {'workyears': ('prep.workyears', 1, True),
+          'maxsave': ('prep.maxsave', 100, True),
+          'endage': ('endage', 1, False)}
+
+
+def floor_solve(S: Data, sepp: bool, spend: float) -> np.ndarray | None:
+    """ The best plan spending at least spend, or None if there isn't one """
+    M = build_model(S, sepp)
+    presolve(S, M, S.tables)
+    M.bounds = np.column_stack([np.zeros(len(M.c)), np.full(len(M.c), np.inf)])
+    M.bounds[0, 0] = spend
+    try:
+        return solve_model(M).x
+    except SolveError:
+        return None
+
+class Probe:
+    """ Plans for one config with one parameter changed, solved once each """
+    def __init__(self, d: dict, param: str, spend: float, sepp: bool = False):
+        (self.key, self.step, self.increasing) = PARAMS[param]
+        self.d = d
+        self.spend = spend
+        self.sepp = sepp
+        self.base = Data()
+        self.base.load(apply_overrides(d, {}))
+        self.results = {}               # value -> (Data, plan or None)
+
+    def data(self, value) -> Data:
+        if self.key == 'prep.maxsave':
+            # nothing derived depends on maxsave
+            S = copy.copy(self.base)
+            S.maxsave = value
+            return S
+        S = Data()
+        S.load(apply_overrides(self.d, {self.key: value}))
+        return S
+
+    def __call__(self, value) -> bool:
+        """ Whether value sustains the spending floor """
+        if value not in self.results:
+            S = self.data(value)
+            self.results[value] = (S, floor_solve(S, self.sepp, self.spend))
+        return self.results[value][1] is not None
+
+def bisect(ok, lo, hi, step, increasing: bool = True):
+    """ Smallest (or with increasing False, largest) value on the grid
+    lo, lo+step, ... hi where ok(value) holds, None if there is none """
+    n = int(round((hi - lo) / step))
+    value = lambda k: lo + k * step
+    (good, bad) = (n, 0) if increasing else (0, n)
+    if not ok(value(good)):
+        return None
+    if ok(value(bad)):
+        return value(bad)
+    # invariant: ok at good, not ok at bad
+    while abs(good - bad) > 1:
+        mid = (good + bad) // 2
+        if ok(value(mid)):
+            good = mid
+        else:
+            bad = mid
+    return value(good)
+
+def goalseek(d: dict, spend: float, param: str = 'workyears',
+             lo=None, hi=None, sepp: bool = False) -> dict:
+    """ Threshold value of param for spending spend, and the plan there
+
+    Returns {'param', 'value', 'probes', 'data', 'plan'}, value None
+    when no value in [lo, hi] works.
+    """
+    probe = Probe(d, param, spend, sepp)
+    S = probe.base
+    if param == 'workyears':
+        if not hasattr(S, 'maxsave'):
+            raise ValueError("workyears needs a [prep] section with maxsave")
+        (lo, hi) = (0 if lo is None else lo, S.endage - S.startage - 1 if hi is None else hi)
+    elif param == 'maxsave':
+        if S.workyr == 0:
+            raise ValueError("maxsave needs work years")
+        (lo, hi) = (0 if lo is None else lo, 10 * S.maxsave if hi is None else hi)
+    else:
+        (lo, hi) = (S.retireage + 1 if lo is None else lo, 120 if hi is None else hi)
+
+    value = bisect(probe, lo, hi, probe.step, probe.increasing)
+    r = {'param': param, 'value': value, 'probes': len(probe.results),
+         'data': None, 'plan': None}
+    if value is not None:
+        (r['data'], r['plan']) = probe.results[value]
+    return r
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan goalseek")
+    parser.add_argument('--spend', type=float, required=True,
+                        help="yearly spending to sustain, in today's dollars")
+    parser.add_argument('--param', choices=PARAMS, default='workyears',
+                        help="what to search (default workyears)")
+    parser.add_argument('--lo', type=float, help="smallest value to try")
+    parser.add_argument('--hi', type=float, help="largest value to try")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    d = load_config(args.conffile)
+    (lo, hi) = (args.lo, args.hi)
+    if args.param != 'maxsave':
+        (lo, hi) = (None if lo is None else int(lo), None if hi is None else int(hi))
+    try:
+        r = goalseek(d, args.spend, args.param, lo, hi, args.sepp)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if r['value'] is None:
+        print("No %s in range sustains %.0f a year (%d solves)" %
+              (args.param, args.spend, r['probes']))
+        exit(1)
+    print("%s = %s sustains %.0f a year (%d solves)" %
+          (args.param, r['value'], args.spend, r['probes']))
+    print()
+    print_ascii(r['data'], r['plan'])
@@ -0,0 +1,138 @@
+"""Monte Carlo over yearly returns (and optionally inflation)
+
+    fplan montecarlo plan.toml -n 10000 --stdev 12
+
+Each path draws a return for every year of the plan, centered on the
+config's `returns`, and re-solves the LP with those yearly growth
+factors.  The result is the distribution of the yearly spending the
+plan can sustain.  Inflation paths move the tax brackets, standard
+deduction and contribution limits; dated income and expenses keep the
+config's fixed inflation.
+"""
+
+import argparse
+import concurrent.futures
+import os
+
+import numpy as np
+
+from . import backends
+from .fplan import (DEFAULT_METHOD, Data, ModelTemplate, Solution, SolveError,
+                    plan_years, solve)
+
+PERCENTILES = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+
+
+def draw(rng: np.random.Generator, n: int, nyears: int,
+         mean: float, stdev: float, dist: str = 'normal') -> np.ndarray:
+    """ n paths of yearly growth rates (1.06, ...) from a mean/stdev in % """
+    if stdev == 0:
+        return np.full((n, nyears), 1 + mean / 100)
+    if dist == 'lognormal':
+        # same arithmetic mean and stdev as the normal case
+        m = 1 + mean / 100
+        sigma2 = np.log(1 + (stdev / 100 / m) ** 2)
+        return np.exp(rng.normal(np.log(m) - sigma2 / 2, np.sqrt(sigma2),
+                                 (n, nyears)))
+    if dist == 'normal':
+        # can't lose more than everything
+        return np.maximum(1 + rng.normal(mean, stdev, (n, nyears)) / 100, 0.01)
+    raise ValueError("Unknown distribution " + dist)
+
+# per-process state, set once by _init() so each chunk only ships paths
+_worker = {}
+
+def _init(S: Data, sepp: bool, method: str | None = None) -> None:
+    _worker['S'] = S
+    _worker['template'] = ModelTemplate(S, sepp)
+    _worker['method'] = method
+
+def _solve_chunk(returns: np.ndarray, inflation: np.ndarray | None) -> np.ndarray:
+    """ Spending goal per path, NaN where the plan is infeasible """
+    (S, template, method) = (_worker['S'], _worker['template'], _worker['method'])
+    spend = np.full(len(returns), np.nan)
+    for i in range(len(returns)):
+        try:
+            res = template.solve(S, returns=returns[i],
+                                 inflation=None if inflation is None else inflation[i],
+                                 method=method)
+        except SolveError:
+            continue
+        spend[i] = Solution(S, res).goal
+    return spend
+
+def simulate(S: Data, sepp: bool, returns: np.ndarray,
+             inflation: np.ndarray | None = None,
+             jobs: int | None = None, method: str | None = None) -> np.ndarray:
+    """ Solve every path, returns the spending goal per path (NaN = failed)
+
+    With method='highspy' each worker warm starts from its last path.
+    """
+    n = len(returns)
+    jobs = jobs or os.cpu_count() or 1
+    chunk = max(1, min(64, -(-n // (4 * jobs))))
+    spend = np.empty(n)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init, initargs=(S, sepp, method)) as pool:
+        futures = {}
+        for start in range(0, n, chunk):
+            inf = None if inflation is None else inflation[start:start+chunk]
+            f = pool.submit(_solve_chunk, returns[start:start+chunk], inf)
+            futures[f] = start
+        for f in concurrent.futures.as_completed(futures):
+            r = f.result()
+            spend[futures[f]:futures[f] + len(r)] = r
+    return spend
+
+def summarize(spend: np.ndarray, target: float) -> dict:
+    """ Spending percentiles, infeasible paths count as zero spending """
+    failed = np.isnan(spend)
+    s = np.where(failed, 0, spend)
+    return {'paths': len(spend),
+            'infeasible': int(np.count_nonzero(failed)),
+            'target': target,
+            'below_target': float(np.mean(s < target)),
+            'percentiles': dict(zip(PERCENTILES, np.percentile(s, PERCENTILES)))}
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan montecarlo")
+    parser.add_argument('-n', '--paths', type=int, default=1000,
+                        help="number of return paths")
+    parser.add_argument('--stdev', type=float, default=12,
+                        help="stdev of yearly returns in %% (default 12)")
+    parser.add_argument('--inflation-stdev', type=float, default=0,
+                        help="stdev of yearly inflation in %% (default 0: fixed)")
+    parser.add_argument('--dist', choices=['normal', 'lognormal'],
+                        default='normal')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--solver', choices=backends.METHODS, default=DEFAULT_METHOD,
+                        help="LP method (default %(default)s)")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    S = Data()
+    S.load_file(args.conffile)
+    nyears = plan_years(S)
+    rng = np.random.default_rng(args.seed)
+    returns = draw(rng, args.paths, nyears, 100 * (S.r_rate - 1),
+                   args.stdev, args.dist)
+    inflation = None
+    if args.inflation_stdev > 0:
+        inflation = draw(rng, args.paths, nyears, 100 * (S.i_rate - 1),
+                         args.inflation_stdev, args.dist)
+
+    target = solve(S, args.sepp, method=args.solver)[0]
+    r = summarize(simulate(S, args.sepp, returns, inflation, args.jobs, args.solver),
+                  target)
+
+    print("paths: %d  infeasible: %d" % (r['paths'], r['infeasible']))
+    print("fixed-return spending: %.0f  paths below it: %.1f%%" %
+          (target, 100 * r['below_target']))
+    print()
+    print(" pct  spending")
+    for (p, v) in r['percentiles'].items():
+        print(" %2d%%  %8.0f" % (p, v))
@@ -0,0 +1,136 @@
+"""Per-phase timing, memory and model statistics
+
+    with Profiler() as prof:
+        S.load_file('plan.toml')
+        res = solve(S, False)
+    print(prof.to_json())
+
+While a Profiler is active, fplan records wall and CPU time and peak
+traced memory for each phase (toml, parse_expenses, import, build, solve,
+render, ...), the size of each model it builds and what the solver
+reported.  Without an active profiler the hooks do nothing.
+"""
+
+import contextlib
+import json
+import platform
+import time
+import tracemalloc
+
+_active = []                    # stack of running profilers
+
+
+class Profiler:
+    """ Collects phases and model/solver stats while active """
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.phases = []
+        self.models = []
+        self.solver = []
+        self.info = {}
+        self._stack = []        # open phases: [name, wall, cpu, peak]
+        self._tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        _active.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.remove(self)
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def _peak(self) -> int:
+        return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if self._stack:
+            # keep the outer peak, then measure this phase on its own
+            self._stack[-1][3] = max(self._stack[-1][3], self._peak())
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        entry = [name, time.perf_counter(), time.process_time(), 0]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            peak = max(entry[3], self._peak())
+            self.phases.append({'phase': name,
+                                'wall': time.perf_counter() - entry[1],
+                                'cpu': time.process_time() - entry[2],
+                                'peak_mem': peak})
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+
+    def record_model(self, M) -> None:
+        rows = M.A_ub.shape[0]
+        nnz = M.A_ub.nnz
+        blocks = {k: s.stop - s.start for (k, s) in M.blocks.items()}
+        if M.A_eq is not None:
+            rows += M.A_eq.shape[0]
+            nnz += M.A_eq.nnz
+            blocks.update({k: s.stop - s.start for (k, s) in M.eq_blocks.items()})
+        cols = len(M.c)
+        self.models.append({'rows': rows,
+                            'cols': cols,
+                            'nnz': nnz,
+                            'density': nnz / max(1, rows * cols),
+                            'presolved': M.presolved,
+                            'blocks': blocks})
+
+    def record_solver(self, res, method: str, seconds: float) -> None:
+        self.solver.append({'method': method,
+                            'status': int(res.status),
+                            'message': res.message,
+                            'iterations': int(getattr(res, 'nit', 0) or 0),
+                            'time': seconds})
+
+    def totals(self) -> dict:
+        """ Wall and CPU time summed by phase name """
+        t = {}
+        for p in self.phases:
+            s = t.setdefault(p['phase'], {'count': 0, 'wall': 0.0, 'cpu': 0.0,
+                                          'peak_mem': 0})
+            s['count'] += 1
+            s['wall'] += p['wall']
+            s['cpu'] += p['cpu']
+            s['peak_mem'] = max(s['peak_mem'], p['peak_mem'])
+        return t
+
+    def report(self) -> dict:
+        import numpy
+        import scipy
+        return {'info': dict(self.info,
+                             python=platform.python_version(),
+                             numpy=numpy.__version__,
+                             scipy=scipy.__version__),
+                'totals': self.totals(),
+                'phases': self.phases,
+                'models': self.models,
+                'solver': self.solver}
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+def phase(name: str):
+    """ Time a phase in the active profiler, if any """
+    if not _active:
+        return contextlib.nullcontext()
+    return _active[-1].phase(name)
+
+def record_model(M) -> None:
+    if _active:
+        _active[-1].record_model(M)
+
+def record_solver(res, method: str, seconds: float) -> None:
+    if _active:
+        _active[-1].record_solver(res, method, seconds)
+
+def active() -> Profiler | None:
+    return _active[-1] if _active else None
@@ -0,0 +1,129 @@
+"""Stream the ledgers of many plans into one columnar file
+
+    with LedgerWriter('runs.parquet', params=['returns']) as out:
+        for (i, S, res) in ...:
+            out.write(i, {'returns': 6}, ledger(S, res))
+
+Every retirement year of every plan becomes one row: the scenario id,
+the scenario's parameters, the plan's spending goal and the YEAR_FIELDS
+columns.  Rows are buffered and written in chunks, so only one chunk is
+ever in memory.  The format comes from the file name:
+
+  .csv              plain CSV, one header line
+  .parquet          Parquet, one row group per chunk (needs pyarrow)
+  .arrow, .feather  Arrow IPC file, can be memory-mapped (needs pyarrow)
+"""
+
+import importlib.util
+import io
+import os
+
+import numpy as np
+
+from .fplan import YEAR_FIELDS, Ledger
+
+# pyarrow takes a while to import and most runs write CSV or nothing,
+# so only the Arrow and Parquet writers import it
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow',
+           '.feather': 'arrow'}
+
+
+def format_for(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError("unknown ledger format %s (have %s)" %
+                         (ext or path, ', '.join(FORMATS)))
+    if FORMATS[ext] != 'csv' and not HAVE_PYARROW:
+        raise ValueError("writing %s needs pyarrow" % ext)
+    return FORMATS[ext]
+
+class LedgerWriter:
+    """ Appends ledgers as rows of one file, see the module docstring
+
+    params are the parameter columns, every write() gives a value for
+    each.  Numbers and bools are stored as floats.
+    """
+    def __init__(self, path: str, params: list[str] = (), chunk_rows: int = 1 << 16):
+        self.path = path
+        self.format = format_for(path)
+        self.params = list(params)
+        self.columns = ['scenario'] + self.params + ['goal'] + YEAR_FIELDS
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._chunks = []               # 2D float arrays waiting to be written
+        self._pending = 0
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, scenario: int, params: dict, L: Ledger) -> None:
+        years = L.years
+        n = len(years)
+        block = np.empty((n, len(self.columns)))
+        block[:, 0] = scenario
+        for (j, key) in enumerate(self.params, start=1):
+            block[:, j] = float(params[key])
+        block[:, len(self.params) + 1] = L.goal
+        block[:, len(self.params) + 2:] = \
+            years[YEAR_FIELDS].view(float).reshape(n, len(YEAR_FIELDS))
+        self._chunks.append(block)
+        self._pending += n
+        self.rows += n
+        if self._pending >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._chunks:
+            return
+        data = np.concatenate(self._chunks)
+        self._chunks = []
+        self._pending = 0
+        if self.format == 'csv':
+            self._write_csv(data)
+        else:
+            self._write_arrow(data)
+
+    def _write_csv(self, data: np.ndarray) -> None:
+        if self._file is None:
+            self._file = open(self.path, 'w', buffering=1 << 20, newline='')
+            self._file.write(','.join(self.columns) + '\n')
+        buf = io.StringIO()
+        # scenario and age are whole numbers, the rest keeps cents
+        fmt = ['%d'] + ['%.10g'] * len(self.params) + ['%.2f'] + \
+              ['%d' if k == 'age' else '%.2f' for k in YEAR_FIELDS]
+        np.savetxt(buf, data, fmt=fmt, delimiter=',')
+        self._file.write(buf.getvalue())
+
+    def _write_arrow(self, data: np.ndarray) -> None:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        arrays = [pyarrow.array(data[:, 0].astype(np.int64))] + \
+                 [pyarrow.array(data[:, j]) for j in range(1, len(self.columns))]
+        batch = pyarrow.RecordBatch.from_arrays(arrays, names=self.columns)
+        if self._writer is None:
+            if self.format == 'parquet':
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, batch.schema)
+            else:
+                self._file = pyarrow.OSFile(self.path, 'wb')
+                self._writer = pyarrow.ipc.new_file(self._file, batch.schema)
+        if self.format == 'parquet':
+            self._writer.write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,176 @@
+"""One plan that holds up across many return paths
+
+    fplan robust plan.toml -k 200 --stdev 12
+    fplan robust plan.toml -k 200 --stdev 12 --fraction 0.95
+
+The withdrawals, conversions, contributions and the spending goal are
+shared by K scenarios; each scenario has its own copy of every
+constraint that depends on the rates (brackets, final balances and
+Roth rows).  Maximizing the goal then finds the largest spending
+floor the one plan can hold in every scenario.  RMDs are not enforced,
+see SKIPPED.
+
+--fraction keeps only that share of the scenarios: the scenario whose
+rows carry the most dual weight (the one holding the floor down the
+most) is relaxed and the LP re-solved, warm started, until enough have
+been dropped.  This is the usual sampling-and-discarding stand-in for a
+chance constraint, which an LP can't express directly.
+
+The model has K times the rows of one plan.  It is assembled as a
+stack of identically structured CSR blocks (one compiled pattern, K
+sets of values), and its size is checked against a memory budget
+before anything is allocated.
+"""
+
+import argparse
+import math
+
+import numpy as np
+import scipy.sparse
+
+from . import backends
+from .fplan import (_BLOCKS, Data, Model, SolveError, Tables, _assemble, _compile,
+                    _objective, plan_years, print_ascii)
+from .montecarlo import draw
+
+# blocks that don't depend on the rates, included once
+SHARED = ['sepp', 'roth59']
+
+# RMDs are left out: the minimum withdrawal from the balance of a good
+# path can be more than the whole balance of a bad one, so one shared
+# schedule can't meet both
+SKIPPED = ['rmd']
+
+# default budget for the assembled model
+MAX_MEMORY_MB = 2048
+
+
+def model_bytes(nrows: int, nnz: int, k: int) -> int:
+    """ Rough peak memory of a K scenario model with nrows and nnz each
+
+    CSR data and indices, indptr and rhs, and about as much again for
+    the solver's own copy.
+    """
+    return 2 * k * (nnz * (8 + 4) + nrows * (8 + 8))
+
+def build_robust(S: Data, sepp: bool, tables: list[Tables],
+                 max_memory_mb: float = MAX_MEMORY_MB) -> tuple[Model, int]:
+    """ (model, rows per scenario) for one plan across len(tables) scenarios
+
+    Shared rows come first, then the rows of each scenario in turn, so
+    scenario k is rows M.blocks['scenarios'].start + k * stride onwards.
+    """
+    shared = [(name, block) for (name, block) in _BLOCKS if name in SHARED]
+    per = [(name, block) for (name, block) in _BLOCKS
+           if name not in SHARED and name not in SKIPPED]
+    c = _objective(S, 'sum')
+    k = len(tables)
+
+    (nrows, rows, cols, vals, _, _) = _assemble(S, sepp, per, tables[0])
+    need = model_bytes(nrows, vals.size, k) / 2**20
+    if need > max_memory_mb:
+        raise ValueError("%d scenarios need about %.0f MB, over the %.0f MB budget"
+                         % (k, need, max_memory_mb))
+    (A0, order) = _compile(nrows, rows, cols, vals, len(c))
+
+    # every scenario has A0's pattern, only the values differ
+    data = np.empty(k * A0.nnz)
+    b = np.empty(k * nrows)
+    for (i, T) in enumerate(tables):
+        (_, _, _, vals, rhs, _) = _assemble(S, sepp, per, T)
+        data[i * A0.nnz:(i + 1) * A0.nnz] = vals[order]
+        b[i * nrows:(i + 1) * nrows] = rhs
+    indptr = np.concatenate([A0.indptr[:-1] + i * A0.nnz for i in range(k)] +
+                            [[k * A0.nnz]])
+    A = scipy.sparse.csr_array((data, np.tile(A0.indices, k), indptr),
+                               shape=(k * nrows, len(c)))
+
+    (ns, rows, cols, vals, bs, blocks) = _assemble(S, sepp, shared, tables[0])
+    top = scipy.sparse.coo_array((vals, (rows, cols)), shape=(ns, len(c))).tocsr()
+    blocks['scenarios'] = slice(ns, ns + k * nrows)
+    M = Model(c, scipy.sparse.vstack([top, A], format='csr'),
+              np.concatenate([bs, b]), blocks)
+    return (M, nrows)
+
+def robust_solve(S: Data, returns: np.ndarray, inflation: np.ndarray | None = None,
+                 sepp: bool = False, fraction: float = 1.0,
+                 max_memory_mb: float = MAX_MEMORY_MB) -> dict:
+    """ The plan with the highest spending floor over the return paths
+
+    returns (and inflation) hold one path of yearly multipliers per
+    row.  fraction < 1 drops the worst scenarios, see the module
+    docstring.  Returns {'plan', 'spend', 'scenarios', 'dropped',
+    'solves'}, dropped being the scenario numbers relaxed in order.
+    """
+    k = len(returns)
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction must be in (0, 1]")
+    tables = [Tables(S, returns[i], None if inflation is None else inflation[i])
+              for i in range(k)]
+    (M, stride) = build_robust(S, sepp, tables, max_memory_mb)
+    start = M.blocks['scenarios'].start
+    lp = backends.Parametric(M.c, M.A_ub, M.b_ub)
+
+    dropped = []
+    keep = np.ones(k, dtype=bool)
+    res = lp.solve()
+    solves = 1
+    while res.status == 0 and len(dropped) < k - math.ceil(fraction * k):
+        weight = np.abs(res.ineqlin.marginals[start:]).reshape(k, stride).sum(axis=1)
+        worst = int(np.argmax(np.where(keep, weight, -1)))
+        keep[worst] = False
+        dropped.append(worst)
+        lp.set_rows_upper(np.arange(start + worst * stride,
+                                    start + (worst + 1) * stride), np.inf)
+        res = lp.solve()
+        solves += 1
+    if res.status != 0:
+        raise SolveError(res)
+    return {'plan': res.x, 'spend': res.x[0], 'scenarios': k,
+            'dropped': dropped, 'solves': solves}
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan robust")
+    parser.add_argument('-k', '--scenarios', type=int, default=100,
+                        help="number of return paths (default 100)")
+    parser.add_argument('--fraction', type=float, default=1.0,
+                        help="share of the paths the floor must hold in (default 1)")
+    parser.add_argument('--stdev', type=float, default=12,
+                        help="stdev of yearly returns in %% (default 12)")
+    parser.add_argument('--inflation-stdev', type=float, default=0,
+                        help="stdev of yearly inflation in %% (default 0: fixed)")
+    parser.add_argument('--dist', choices=['normal', 'lognormal'],
+                        default='normal')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--max-memory', type=float, default=MAX_MEMORY_MB,
+                        metavar='MB', help="refuse models larger than this "
+                        "(default %(default)s)")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    S = Data()
+    S.load_file(args.conffile)
+    nyears = plan_years(S)
+    rng = np.random.default_rng(args.seed)
+    returns = draw(rng, args.scenarios, nyears, 100 * (S.r_rate - 1),
+                   args.stdev, args.dist)
+    inflation = None
+    if args.inflation_stdev > 0:
+        inflation = draw(rng, args.scenarios, nyears, 100 * (S.i_rate - 1),
+                         args.inflation_stdev, args.dist)
+    try:
+        r = robust_solve(S, returns, inflation, args.sepp, args.fraction,
+                         args.max_memory)
+    except ValueError as e:
+        parser.error(str(e))
+    except SolveError as e:
+        print("No plan holds in the scenarios: %s" % e.res.message)
+        exit(1)
+
+    held = r['scenarios'] - len(r['dropped'])
+    print("Spending floor %.0f holds in %d of %d scenarios (%d solves)" %
+          (r['spend'], held, r['scenarios'], r['solves']))
+    print()
+    print_ascii(S, r['plan'])
@@ -0,0 +1,172 @@
+"""What one more unit of each input is worth, from a single solve
+
+    fplan sensitivity plan.toml
+
+The solver's dual values (marginals) say how much the spending goal
+would change if a constraint's right hand side moved by $1.  They are
+reported per named constraint row (a bracket in a year, a final
+balance, Roth aging, RMD, work contribution limits) and combined with
+the derivative of the model in each input to give the marginal yearly
+spending per unit of that input.  The model is rebuilt, not re-solved,
+to find those derivatives.  Like any dual, the numbers only hold for
+small changes that don't move the optimal plan to a different set of
+binding constraints; at a kink (a zero balance, a limit that just
+stops binding) they give the slope on one side only.
+"""
+
+import argparse
+
+import numpy as np
+
+from .fplan import (FORMULATIONS, Data, Model, SolveError, build_model, load_config,
+                    solve_model)
+from .sweep import apply_overrides
+
+# input -> its current value in a loaded plan
+INPUTS = {
+    'IRA.bal': lambda S: S.IRA['bal'],
+    'aftertax.bal': lambda S: S.aftertax['bal'],
+    'aftertax.basis': lambda S: S.aftertax['basis'],
+    'roth.bal': lambda S: S.roth['bal'],
+    'prep.maxsave': lambda S: S.maxsave,
+    'IRA.maxcontrib': lambda S: S.IRA['maxcontrib'],
+    'roth.maxcontrib': lambda S: S.roth['maxcontrib'],
+    'returns': lambda S: 100 * (S.r_rate - 1),
+    'inflation': lambda S: 100 * (S.i_rate - 1),
+}
+# only matter with work years
+WORK_INPUTS = ['prep.maxsave', 'IRA.maxcontrib', 'roth.maxcontrib']
+
+WORK_LIMITS = ['maxsave', 'ira', 'roth']
+
+
+def row_labels(S: Data, M: Model) -> tuple[list, list]:
+    """ (block, age, detail) for each row of A_ub and of A_eq
+
+    age is None for rows about the whole plan.
+    """
+    def label(name: str, n: int) -> list:
+        i = np.arange(n)
+        if name == 'work':
+            return [('work', S.startage + j // 3, WORK_LIMITS[j % 3]) for j in i]
+        if name == 'brackets':
+            ntax = len(S.taxrates)
+            return [('brackets', S.retireage + j // ntax,
+                     "%g%%" % (100 * S.taxrates[j % ntax][1])) for j in i]
+        if name in ('roth59', 'roth59_bal', 'ira_bal', 'roth_bal'):
+            first = S.retireage
+        elif name == 'roth':
+            first = max(S.retireage, 59)
+        elif name == 'rmd':
+            first = max(S.retireage, 73)
+        else:
+            return [(name, None, None)] * n
+        return [(name, first + j, None) for j in i]
+
+    def labels(blocks: dict[str, slice]) -> list:
+        out = []
+        for (name, rows) in blocks.items():
+            out += label(name, rows.stop - rows.start)
+        return out
+
+    return (labels(M.blocks), labels(M.eq_blocks))
+
+def _derivative(d: dict, key: str, value: float, sepp: bool,
+                formulation: str) -> tuple[Model, Model, float]:
+    """ Models built with key nudged down and up, and the step between them """
+    h = 1e-4 * max(1.0, abs(value))
+    models = []
+    for v in (value - h, value + h):
+        S = Data()
+        S.load(apply_overrides(d, {key: v}))
+        models.append(build_model(S, sepp, formulation=formulation))
+    return (models[0], models[1], 2 * h)
+
+def _dgoal(lo: Model, hi: Model, h: float, x: np.ndarray,
+           ub: np.ndarray, eq: np.ndarray | None) -> float:
+    """ Change in the spending goal per unit change of the input
+
+    The solver minimizes -goal, and its marginals are the change in that
+    per unit of b, so by the envelope theorem
+        d goal = marginals . (dA x - db)
+    """
+    if lo.A_ub.shape != hi.A_ub.shape:
+        return np.nan                   # input changes the plan's shape
+    d = ub @ ((hi.A_ub - lo.A_ub) @ x - (hi.b_ub - lo.b_ub))
+    if eq is not None:
+        d += eq @ ((hi.A_eq - lo.A_eq) @ x - (hi.b_eq - lo.b_eq))
+    return float(d / h)
+
+class Sensitivity:
+    """ Dual values of a solved plan
+
+    rows and eq_rows are lists of (block, age, detail, price) where price
+    is the yearly spending gained per $1 more room in that constraint.
+    inputs maps each input to (value, spending per unit of the input).
+    """
+    def __init__(self, res, rows: list, eq_rows: list, inputs: dict):
+        self.res = res
+        self.rows = rows
+        self.eq_rows = eq_rows
+        self.inputs = inputs
+
+    def binding(self, tol: float = 1e-9) -> list:
+        """ Constraints with a nonzero price, most valuable first """
+        rows = [r for r in self.rows + self.eq_rows if abs(r[3]) > tol]
+        return sorted(rows, key=lambda r: -abs(r[3]))
+
+def sensitivity(d: dict, sepp: bool = False, formulation: str = 'sum',
+                inputs: list[str] | None = None) -> Sensitivity:
+    """ Solve the plan in config dict d once and price its inputs """
+    S = Data()
+    S.load(apply_overrides(d, {}))
+    # account sections with their defaults filled in, so overriding one
+    # field of a section the config left out still loads
+    d = apply_overrides(d, {'aftertax': S.aftertax, 'IRA': S.IRA, 'roth': S.roth})
+    M = build_model(S, sepp, formulation=formulation)
+    res = solve_model(M)
+    ub = np.asarray(res.ineqlin.marginals)
+    eq = np.asarray(res.eqlin.marginals) if M.A_eq is not None else None
+
+    (labels, eq_labels) = row_labels(S, M)
+    rows = [l + (-p,) for (l, p) in zip(labels, ub)]
+    eq_rows = [l + (-p,) for (l, p) in zip(eq_labels, eq if eq is not None else [])]
+
+    if inputs is None:
+        inputs = [k for k in INPUTS if S.workyr > 0 or k not in WORK_INPUTS]
+        if S.aftertax['bal'] == 0:
+            inputs.remove('aftertax.basis')
+    prices = {}
+    for key in inputs:
+        value = INPUTS[key](S)
+        (lo, hi, h) = _derivative(d, key, value, sepp, formulation)
+        prices[key] = (value, _dgoal(lo, hi, h, res.x, ub, eq))
+    return Sensitivity(res, rows, eq_rows, prices)
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan sensitivity")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='sum')
+    parser.add_argument('-n', '--rows', type=int, default=20,
+                        help="binding constraints to list (default 20)")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    d = load_config(args.conffile)
+    try:
+        r = sensitivity(d, args.sepp, args.formulation)
+    except SolveError as e:
+        print(e.res)
+        exit(1)
+
+    print("Yearly spending <= %.0f" % r.res.x[0])
+    print()
+    print("%-16s %12s %14s" % ("input", "value", "spend/unit"))
+    for (key, (value, price)) in r.inputs.items():
+        print("%-16s %12.2f %14.4f" % (key, value, price))
+    print()
+    print("%-12s %4s %6s %12s" % ("constraint", "age", "", "spend/$"))
+    for (block, age, detail, price) in r.binding()[:args.rows]:
+        print("%-12s %4s %6s %12.4f" % (block, '' if age is None else age,
+                                       detail or '', price))
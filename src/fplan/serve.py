@@ -0,0 +1,147 @@
+"""Long running solver service
+
+    fplan serve                          # JSON lines on stdin/stdout
+    fplan serve --http 127.0.0.1:8765    # POST one JSON request per call
+
+Each request is one JSON object holding the plan either as TOML text or
+as the dict a config file parses to, plus optional solve settings:
+
+    {"id": 1, "toml": "startage = 55\\n..."}
+    {"id": 2, "config": {"startage": 55, "IRA": {"bal": 400000}},
+     "sepp": true, "formulation": "balance", "ledger": false}
+
+The reply echoes the id and has a status of 'ok', 'failed' (the solver
+found no plan) or 'error' (a bad request), see handle().  Requests run
+in a pool of worker processes that import the solver once, so in JSON
+lines mode replies are written as they finish, not in request order.
+"""
+
+import argparse
+import concurrent.futures
+import http.server
+import importlib
+import json
+import sys
+import threading
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
+
+from .fplan import FORMULATIONS, Data, Solution, SolveError, ledger, solve
+
+
+def _warm() -> None:
+    # pay for the imports when the pool starts, not on the first request
+    importlib.import_module('scipy.optimize')
+
+def handle(request: dict) -> dict:
+    """ Solve one request, errors are returned rather than raised """
+    reply = {'id': request.get('id')}
+    try:
+        if 'toml' in request:
+            d = tomllib.loads(request['toml'])
+        elif isinstance(request.get('config'), dict):
+            d = request['config']
+        else:
+            raise ValueError("request needs 'toml' or 'config'")
+        formulation = request.get('formulation', 'sum')
+        if formulation not in FORMULATIONS:
+            raise ValueError("unknown formulation " + str(formulation))
+        S = Data()
+        S.load(d)
+        res = solve(S, bool(request.get('sepp', False)), formulation=formulation)
+    except SolveError as e:
+        return dict(reply, status='failed', message=e.res.message)
+    except Exception as e:
+        return dict(reply, status='error', message="%s: %s" % (type(e).__name__, e))
+    P = Solution(S, res)
+    reply.update(status='ok', spend=float(P.goal), sepp=float(P.principal))
+    if request.get('ledger', True):
+        reply['ledger'] = ledger(S, res).to_dict()
+    return reply
+
+def _parse(line: str) -> dict | None:
+    """ One request, or None when the line is not a JSON object """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+    return request if isinstance(request, dict) else None
+
+def serve_lines(infile, outfile, pool: concurrent.futures.Executor) -> None:
+    """ Answer a JSON request per line of infile until it ends """
+    lock = threading.Lock()
+
+    def write(reply: dict) -> None:
+        with lock:
+            outfile.write(json.dumps(reply) + '\n')
+            outfile.flush()
+
+    def done(f: concurrent.futures.Future) -> None:
+        write(f.result())
+
+    pending = []
+    for line in infile:
+        if not line.strip():
+            continue
+        request = _parse(line)
+        if request is None:
+            write({'id': None, 'status': 'error', 'message': "not a JSON object"})
+            continue
+        f = pool.submit(handle, request)
+        f.add_done_callback(done)
+        pending.append(f)
+    concurrent.futures.wait(pending)
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """ POST a request as the body, the reply comes back as JSON """
+    pool: concurrent.futures.Executor
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = _parse(self.rfile.read(length))
+        if request is None:
+            reply = {'id': None, 'status': 'error', 'message': "not a JSON object"}
+        else:
+            reply = self.pool.submit(handle, request).result()
+        body = json.dumps(reply).encode()
+        self.send_response(400 if reply['status'] == 'error' else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def parse_address(s: str) -> tuple[str, int]:
+    """ 'host:port' or just 'port' (on localhost) """
+    (host, sep, port) = s.rpartition(':')
+    return (host if sep else '127.0.0.1', int(port))
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan serve")
+    parser.add_argument('--http', metavar='[HOST:]PORT',
+                        help="serve HTTP instead of JSON lines on stdin")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs,
+                                                initializer=_warm) as pool:
+        if not args.http:
+            serve_lines(sys.stdin, sys.stdout, pool)
+            return
+        try:
+            address = parse_address(args.http)
+        except ValueError:
+            parser.error("bad address " + args.http)
+        Handler.pool = pool
+        with http.server.ThreadingHTTPServer(address, Handler) as server:
+            print("serving on http://%s:%d/" % server.server_address[:2],
+                  file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
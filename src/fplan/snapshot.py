@@ -0,0 +1,123 @@
+"""Compiled snapshots of a loaded config
+
+    fplan snapshot plan.toml plan.snap
+    fplan plan.snap                     # any command taking a config
+
+A snapshot is a loaded Data saved as one binary file: a small JSON
+header with the scalar fields and where each array lives, then the
+arrays (income, expenses, taxed and the Tables) back to back, each
+aligned for np.memmap.  Data.load_file() of a snapshot parses no TOML
+and computes nothing; the arrays are read-only maps of the file, so
+many processes loading the same snapshot share its pages.
+
+The header also keeps the config as parsed, for commands that change
+it before loading (sweep, goalseek, ...), see fplan.load_config().
+Those still load each changed plan from the config.
+
+    magic (8 bytes) | header length (uint32) | JSON header | arrays
+"""
+
+import argparse
+import copy
+import json
+import struct
+
+import numpy as np
+
+from .fplan import Data, Tables, load_config
+
+MAGIC = b'FPLANSNP'
+# bump when Data or Tables change fields or meaning
+SNAPSHOT_VERSION = 2
+ALIGN = 64
+
+# Data fields stored as arrays, the rest go in the header
+ARRAYS = ['income', 'expenses', 'taxed']
+
+
+def is_snapshot(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _json(v):
+    """ NumPy scalars as plain Python for json.dumps() """
+    if isinstance(v, np.generic):
+        return v.item()
+    raise TypeError("can't store %r in a snapshot" % (v,))
+
+def save(S: Data, path: str, config: dict | None = None) -> None:
+    """ Write S as a snapshot, config is the parsed config S came from """
+    arrays = {k: np.ascontiguousarray(getattr(S, k), dtype=float) for k in ARRAYS}
+    for (k, v) in vars(S.tables).items():
+        arrays['tables.' + k] = np.ascontiguousarray(v, dtype=float)
+    fields = {k: v for (k, v) in vars(S).items() if k not in ARRAYS and k != 'tables'}
+
+    # offsets are from the start of the array area, which starts aligned
+    layout = {}
+    offset = 0
+    for (k, a) in arrays.items():
+        layout[k] = [offset, list(a.shape)]
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    header = json.dumps({'version': SNAPSHOT_VERSION, 'fields': fields,
+                         'arrays': layout, 'config': config}, default=_json).encode()
+    start = len(MAGIC) + 4 + len(header)
+    pad = -start % ALIGN
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header) + pad))
+        f.write(header + b' ' * pad)
+        for (k, a) in arrays.items():
+            f.write(a.tobytes())
+            f.write(b'\0' * (-a.nbytes % ALIGN))
+
+def _header(path: str) -> tuple[dict, int]:
+    """ (header, where the arrays start) """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not an fplan snapshot" % path)
+        (n,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(n))
+    if header['version'] != SNAPSHOT_VERSION:
+        raise ValueError("%s is snapshot version %d, this fplan reads %d; "
+                         "compile it again" % (path, header['version'], SNAPSHOT_VERSION))
+    return (header, len(MAGIC) + 4 + n)
+
+def config(path: str) -> dict:
+    """ The parsed config the snapshot at path was made from """
+    (header, _) = _header(path)
+    if header['config'] is None:
+        raise ValueError("%s was saved without its config" % path)
+    return header['config']
+
+def load_into(S: Data, path: str) -> None:
+    """ Fill S from the snapshot at path """
+    (header, start) = _header(path)
+    # one map of the array area, every array is a view into it
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=start)
+    arrays = {k: np.ndarray(shape, dtype='<f8', buffer=data, offset=offset)
+              for (k, (offset, shape)) in header['arrays'].items()}
+    vars(S).update(header['fields'])
+    for k in ARRAYS:
+        setattr(S, k, arrays[k])
+    T = Tables.__new__(Tables)
+    for (k, a) in arrays.items():
+        if k.startswith('tables.'):
+            setattr(T, k[len('tables.'):], a)
+    S.tables = T
+
+def load(path: str) -> Data:
+    S = Data()
+    load_into(S, path)
+    return S
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan snapshot")
+    parser.add_argument('conffile')
+    parser.add_argument('output', help="snapshot file to write")
+    args = parser.parse_args(argv)
+
+    d = load_config(args.conffile)
+    S = Data()
+    S.load(copy.deepcopy(d))
+    save(S, args.output, d)
@@ -0,0 +1,147 @@
+"""Run one config over a grid of parameter overrides
+
+    fplan sweep base.toml --grid returns=4:8:0.5 --grid inflation=2,3
+
+Every combination of grid values is a scenario.  Scenarios are solved
+in a process pool and one CSV row is printed per scenario as soon as it
+finishes, so rows are not in scenario order.
+
+    fplan sweep base.toml --grid returns=4:8:0.5 --ledger runs.parquet
+
+also writes every retirement year of every plan to one file, streamed
+as scenarios finish (see results.LedgerWriter).
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import copy
+import csv
+import itertools
+import sys
+
+from .fplan import (Data, ModelTemplate, Solution, SolveError, ledger, load_config,
+                    plan_shape)
+from .results import LedgerWriter
+
+
+def parse_value(s: str):
+    """ Config value from the command line: int, float or bool """
+    if s.lower() in ('true', 'false'):
+        return s.lower() == 'true'
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def parse_grid(spec: str) -> tuple[str, list]:
+    """ 'key=start:stop:step' (stop included) or 'key=v1,v2,...' """
+    (key, sep, values) = spec.partition('=')
+    if not sep or not key or not values:
+        raise ValueError("Bad grid " + spec)
+    if ':' in values:
+        (start, stop, step) = [parse_value(x) for x in values.split(':')]
+        if step <= 0:
+            raise ValueError("Bad grid step " + spec)
+        n = int(round((stop - start) / step))
+        vals = [start + i * step for i in range(n + 1)]
+        if isinstance(step, float) or isinstance(start, float):
+            vals = [round(v, 10) for v in vals]
+    else:
+        vals = [parse_value(x) for x in values.split(',')]
+    return (key, vals)
+
+def apply_overrides(d: dict, overrides: dict) -> dict:
+    """ Copy of config d with dotted keys (prep.workyears) replaced """
+    d = copy.deepcopy(d)
+    for (key, value) in overrides.items():
+        node = d
+        path = key.split('.')
+        for k in path[:-1]:
+            node = node.setdefault(k, {})
+        node[path[-1]] = value
+    return d
+
+def scenarios(grid: list[tuple[str, list]]) -> list[dict]:
+    """ Every combination of the grid values """
+    keys = [k for (k, _) in grid]
+    return [dict(zip(keys, vals))
+            for vals in itertools.product(*[v for (_, v) in grid])]
+
+# compiled models in this process, by plan shape
+_templates = {}
+
+def run_scenario(base: dict, overrides: dict, sepp: bool, with_ledger: bool = False) -> dict:
+    """ Solve one scenario, errors are returned rather than raised
+
+    with_ledger adds the plan's Ledger as 'ledger'.
+    """
+    try:
+        S = Data()
+        S.load(apply_overrides(base, overrides))
+        shape = plan_shape(S, sepp)
+        if shape not in _templates:
+            _templates[shape] = ModelTemplate(S, sepp)
+        res = _templates[shape].solve(S)
+    except SolveError as e:
+        return {'status': 'failed', 'message': e.res.message}
+    except Exception as e:
+        return {'status': 'error', 'message': "%s: %s" % (type(e).__name__, e)}
+    P = Solution(S, res)
+    r = {'status': 'ok', 'spend': P.goal, 'sepp': P.principal}
+    if with_ledger:
+        r['ledger'] = ledger(S, res)
+    return r
+
+def sweep(base: dict, grid: list[tuple[str, list]], sepp: bool = False,
+          jobs: int | None = None, with_ledger: bool = False):
+    """ Yield (scenario id, overrides, result) as each scenario finishes """
+    todo = scenarios(grid)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_scenario, base, o, sepp, with_ledger): (i, o)
+                   for (i, o) in enumerate(todo)}
+        for f in concurrent.futures.as_completed(futures):
+            (i, o) = futures[f]
+            yield (i, o, f.result())
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan sweep")
+    parser.add_argument('--grid', action='append', default=[], required=True,
+                        help="key=start:stop:step or key=v1,v2,...")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--ledger', metavar='FILE',
+                        help="write every plan's yearly ledger to FILE "
+                             "(.csv, .parquet or .arrow)")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    try:
+        grid = [parse_grid(g) for g in args.grid]
+    except ValueError as e:
+        parser.error(str(e))
+    base = load_config(args.conffile)
+
+    keys = [k for (k, _) in grid]
+    writer = contextlib.nullcontext()
+    if args.ledger:
+        try:
+            writer = LedgerWriter(args.ledger, params=keys)
+        except ValueError as e:
+            parser.error(str(e))
+
+    out = csv.writer(sys.stdout)
+    out.writerow(['scenario'] + keys + ['status', 'spend', 'sepp'])
+    sys.stdout.flush()
+    with writer:
+        for (i, overrides, r) in sweep(base, grid, args.sepp, args.jobs, bool(args.ledger)):
+            if r['status'] == 'ok':
+                tail = [r['status'], "%.0f" % r['spend'], "%.0f" % r['sepp']]
+                if args.ledger:
+                    writer.write(i, overrides, r['ledger'])
+            else:
+                tail = ["%s: %s" % (r['status'], r['message']), '', '']
+            out.writerow([i] + [overrides[k] for k in keys] + tail)
+            sys.stdout.flush()
@@ -0,0 +1,208 @@
+"""Replay a solved plan and check it against the rules
+
+    fplan --validate plan.toml
+    fplan validate DIR [DIR...]
+
+The LP folds growth, taxes and the account rules into sums of
+coefficients.  This module replays the plan it found year by year with
+its own arithmetic: balances grow from the config's rates, tax is
+figured bracket by bracket, and each rule (work contribution limits,
+balances staying positive, the spending goal, Roth aging, RMDs, the
+SEPP reserve) is checked directly.  Any year where the replay doesn't
+back up what the LP assumed is reported.
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+
+import numpy as np
+
+from . import fplan
+from .fplan import Data, Solution, SolveError, solve
+
+
+def _grown(start: float, flow: np.ndarray, r: float) -> np.ndarray:
+    """ Balance at the start of each year and after the last, flow[t]
+    added at the start of year t and the total grown by r each year """
+    n = len(flow)
+    g = r ** np.arange(n + 1)
+    return start * g + g * np.concatenate([[0], np.cumsum(flow * r ** -np.arange(n))])
+
+def income_tax(S: Data, inc: np.ndarray, i_mul: np.ndarray) -> np.ndarray:
+    """ Federal and state tax on taxable income, summed bracket by bracket """
+    cut = np.array([x for (x, _) in S.taxrates])
+    rate = np.array([y for (_, y) in S.taxrates])
+    rate = np.where(rate > 0, rate + S.state_tax, rate)
+    lo = cut[None, :] * i_mul[:, None]
+    hi = np.concatenate([cut[1:], [np.inf]])[None, :] * i_mul[:, None]
+    part = np.clip(inc[:, None], lo, hi) - lo
+    return part @ rate
+
+def replay(S: Data, res: np.ndarray) -> dict[str, np.ndarray]:
+    """ Balances and flows of the plan in res, all years at once
+
+    Retirement balances are at the start of each year plus one entry
+    for the end of the plan.
+    """
+    P = Solution(S, res)
+    (W, n, r) = (S.workyr, S.numyr, S.r_rate)
+    year = np.arange(n)
+    p = {'goal': P.goal, 'principal': P.principal,
+         'work_savings': P.savings_contrib, 'work_ira': P.ira_contrib,
+         'work_roth': P.roth_contrib,
+         'savings': P.savings_withdraw, 'ira': P.ira_withdraw,
+         'roth': P.roth_withdraw, 'convert': P.ira_to_roth,
+         'i_mul': S.i_rate ** (W + year)}
+    p['sepp'] = np.where(year < S.sepp_end, P.principal / S.sepp_ratio, 0)
+
+    at_retire = {}
+    for (name, bal) in [('savings', S.aftertax['bal']), ('ira', S.IRA['bal']),
+                        ('roth', S.roth['bal'])]:
+        at_retire[name] = _grown(bal, p['work_' + name], r)[-1]
+    p['savings_bal'] = _grown(at_retire['savings'], -p['savings'], r)
+    p['ira_bal'] = _grown(at_retire['ira'], -(p['ira'] + p['convert'] + p['sepp']), r)
+    p['roth_bal'] = _grown(at_retire['roth'], p['convert'] - p['roth'], r)
+    # IRA without the SEPP payments, the principal stays reserved
+    p['ira_free'] = _grown(at_retire['ira'], -(p['ira'] + p['convert']), r)
+
+    inc = p['ira'] + p['convert'] + p['sepp'] + np.asarray(S.taxed) - S.stded * p['i_mul']
+    tax = income_tax(S, np.maximum(inc, 0), p['i_mul'])
+    if S.aftertax['basis'] > 0:
+        gains = 1 - S.aftertax['basis'] / (S.aftertax['bal'] * r ** (W + year))
+    else:
+        gains = 1
+    tax += p['savings'] * gains * (fplan.cg_tax + S.state_cg_tax)
+    tax += np.where(S.retireage + year < 59, 0.10 * p['ira'], 0)
+    p['tax'] = tax
+    p['spend'] = (p['savings'] + p['ira'] + p['roth'] + p['sepp'] - tax
+                  - np.asarray(S.expenses) + np.asarray(S.income))
+    return p
+
+def _short(need: np.ndarray, got: np.ndarray) -> np.ndarray:
+    """ Where got falls short of need by more than rounding """
+    return got < need - np.maximum(1.0, 1e-6 * np.abs(need))
+
+def check(S: Data, res: np.ndarray) -> list[tuple]:
+    """ (age, rule, needed, got) for every broken rule, empty if the plan holds """
+    p = replay(S, res)
+    (W, n, r) = (S.workyr, S.numyr, S.r_rate)
+    issues = []
+
+    def flag(rule: str, ages: np.ndarray, need: np.ndarray, got: np.ndarray) -> None:
+        (need, got) = np.broadcast_arrays(need, got)
+        for k in np.flatnonzero(_short(need, got)):
+            issues.append((int(ages[k]), rule, float(need[k]), float(got[k])))
+
+    # work years, contributions within the limits
+    y = np.arange(W)
+    work_age = S.startage + y
+    if W > 0:
+        maxsave = S.maxsave * (S.i_rate ** y if S.maxsave_inflation else 1)
+        used = S.worktax * (p['work_savings'] + p['work_roth']) + p['work_ira']
+        flag('maxsave', work_age, used, maxsave)
+        flag('ira contribution', work_age, p['work_ira'],
+             S.IRA['maxcontrib'] * S.i_rate ** y)
+        flag('roth contribution', work_age, p['work_roth'],
+             S.roth['maxcontrib'] * S.i_rate ** y)
+
+    year = np.arange(n)
+    age = S.retireage + year
+    end = S.retireage + np.arange(n + 1)
+    flag('savings balance', end, 0, p['savings_bal'])
+    flag('ira balance', end, 0, p['ira_bal'])
+    flag('roth balance', end, 0, p['roth_bal'])
+    flag('spending goal', age, p['goal'] * p['i_mul'], p['spend'])
+
+    # before 59 only aged contributions and conversions come out of Roth
+    early = year[age < 59]
+    if early.size:
+        aged = np.zeros(early.size)
+        for (a, amount) in S.roth['contributions']:
+            aged += np.where(S.retireage + early >= a + 5, amount, 0)
+        # a work year's contribution can be spent 5 years later
+        work_aged = np.concatenate([[0], np.cumsum(p['work_roth'])])
+        aged += work_aged[np.clip(W - 4 + early, 0, W)]
+        conv = np.concatenate([np.zeros(5), np.cumsum(p['convert'])])
+        aged += conv[early]
+        flag('roth aging', S.retireage + early, np.cumsum(p['roth'])[early], aged)
+
+    # after 59 conversions must age 5 years before they are spent
+    late = np.arange(max(0, 59 - S.retireage), n + 1)
+    if late.size:
+        young = np.zeros(n + 1)
+        for k in range(1, 6):
+            c = np.concatenate([np.zeros(k), p['convert']])[:n + 1]
+            young += c * r ** k
+        flag('roth aging', S.retireage + late, 0, (p['roth_bal'] - young)[late])
+
+    # RMDs from 73
+    rmd_years = year[age >= 73]
+    if rmd_years.size:
+        factor = np.array(fplan.RMD)[age[rmd_years] - 72]
+        flag('rmd', age[rmd_years], p['ira_bal'][rmd_years] / factor,
+             p['ira'][rmd_years])
+
+    # SEPP principal is left alone until SEPP ends
+    if p['principal'] > 0 and S.sepp_end <= n:
+        flag('sepp reserve', np.array([S.retireage + S.sepp_end]),
+             np.array([p['principal'] * r ** S.sepp_end]),
+             p['ira_free'][S.sepp_end:S.sepp_end + 1])
+    return issues
+
+def print_issues(issues: list[tuple]) -> None:
+    if not issues:
+        print("Validation: plan holds in every year")
+        return
+    print("Validation: %d problems" % len(issues))
+    for (age, rule, need, got) in issues:
+        print(" %3d: %-18s needed %12.0f got %12.0f" % (age, rule, need, got))
+
+def validate_file(file: str, sepp: bool) -> tuple[str, str, list]:
+    """ (file, status, issues) where status is ok, invalid, failed or error """
+    try:
+        S = Data()
+        S.load_file(file)
+        res = solve(S, sepp)
+    except SolveError as e:
+        return (file, 'failed', [e.res.message])
+    except Exception as e:
+        return (file, 'error', ["%s: %s" % (type(e).__name__, e)])
+    issues = check(S, res)
+    return (file, 'invalid' if issues else 'ok', issues)
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan validate")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('paths', nargs='+', metavar='DIR',
+                        help="directories of .toml configs (or config files)")
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.toml')))
+        else:
+            files.append(path)
+
+    bad = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(validate_file, f, args.sepp) for f in files]
+        for f in concurrent.futures.as_completed(futures):
+            (file, status, issues) = f.result()
+            print("%-8s %s" % (status, file))
+            if status == 'invalid':
+                for (age, rule, need, got) in issues[:5]:
+                    print("    %3d: %s needed %.0f got %.0f" % (age, rule, need, got))
+            elif status != 'ok':
+                print("    " + issues[0])
+            bad += status != 'ok'
+            sys.stdout.flush()
+    print("%d of %d plans ok" % (len(files) - bad, len(files)))
+    if bad:
+        sys.exit(1)
@@ -0,0 +1,127 @@
+"""Re-solve a plan every time its config is saved
+
+    fplan watch plan.toml
+
+Keeps the loaded plan and its compiled LP between edits.  When the file
+changes the new config is compared with the old one section by
+section, and only the constraint blocks that read a changed section
+are recomputed (DEPENDS): a taxes change redoes the bracket rows, a
+new IRA balance the IRA rows, new Roth contributions the Roth rows.
+Changing the plan's shape (ages, work years, number of brackets)
+compiles a new LP.  With highspy the re-solve starts from the last
+optimal basis.
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+from . import backends
+from .fplan import (FORMULATIONS, Data, ModelTemplate, SolveError, load_config,
+                    plan_shape, print_ascii, solve_model)
+
+# config section -> blocks that read it.  Sections not listed (returns,
+# inflation, ages, anything new) redo every block.
+DEPENDS = {'taxes': ['brackets'],
+           'income': ['brackets'],
+           'expense': ['brackets'],
+           'aftertax': ['brackets', 'savings'],
+           'IRA': ['work', 'ira', 'sepp_end', 'rmd', 'ira_bal'],
+           'roth': ['work', 'roth59', 'roth', 'roth_bal', 'roth59_bal'],
+           'prep': ['work']}
+
+
+def changed_sections(old: dict, new: dict) -> set[str]:
+    return {k for k in old.keys() | new.keys() if old.get(k) != new.get(k)}
+
+def affected_blocks(sections: set[str]) -> set[str] | None:
+    """ Blocks to recompute after sections changed, None for all """
+    if any(k not in DEPENDS for k in sections):
+        return None
+    return {name for k in sections for name in DEPENDS[k]}
+
+class Watcher:
+    """ One config file, its loaded Data and compiled LP """
+    def __init__(self, path: str, sepp: bool = False, formulation: str = 'sum',
+                 method: str | None = None):
+        self.path = path
+        self.sepp = sepp
+        self.formulation = formulation
+        self.method = method or ('highspy' if backends.HAVE_HIGHSPY else 'highs-ds')
+        self.d = None           # the config as parsed, before Data.load() fills it in
+        self.S = None
+        self.template = None
+        self.mtime = None
+
+    def changed(self) -> bool:
+        """ Whether the file was saved since the last reload() """
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except FileNotFoundError:
+            return False        # editors can remove the file while saving
+
+    def reload(self) -> dict:
+        """ Load the file, update the LP and solve it
+
+        Returns {'blocks': recomputed block names or 'all', 'x', 'seconds'},
+        parse errors and solver failures are raised.
+        """
+        start = time.perf_counter()
+        self.mtime = os.stat(self.path).st_mtime_ns
+        d = load_config(self.path)
+        S = Data()
+        S.load(copy.deepcopy(d))
+
+        blocks = None
+        if self.template is None or plan_shape(S, self.sepp, self.formulation) != self.template.shape:
+            self.template = ModelTemplate(S, self.sepp, self.formulation)
+        else:
+            blocks = affected_blocks(changed_sections(self.d, d))
+            if blocks is None:
+                self.template.update(S)
+            else:
+                self.template.update_blocks(S, blocks)
+        (self.d, self.S) = (d, S)
+        x = solve_model(self.template.model, method=self.method).x
+        return {'blocks': 'all' if blocks is None else sorted(blocks), 'x': x,
+                'seconds': time.perf_counter() - start}
+
+def _redraw(w: Watcher) -> None:
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end='')
+    print("%s  %s" % (w.path, time.strftime('%H:%M:%S')))
+    try:
+        r = w.reload()
+    except SolveError as e:
+        print("No plan: %s" % e.res.message)
+    except Exception as e:
+        print("Error: %s: %s" % (type(e).__name__, e))
+    else:
+        print("solved in %.0f ms, rebuilt %s" %
+              (1000 * r['seconds'], ', '.join(r['blocks']) if r['blocks'] != 'all' else 'all blocks'))
+        print()
+        print_ascii(w.S, r['x'])
+    sys.stdout.flush()
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog="fplan watch")
+    parser.add_argument('--sepp', action='store_true',
+                        help="Enable SEPP processing")
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='sum')
+    parser.add_argument('--solver', choices=backends.METHODS,
+                        help="LP method (default highspy when installed, else highs-ds)")
+    parser.add_argument('--interval', type=float, default=0.25,
+                        help="seconds between checks of the file (default 0.25)")
+    parser.add_argument('conffile')
+    args = parser.parse_args(argv)
+
+    w = Watcher(args.conffile, args.sepp, args.formulation, args.solver)
+    try:
+        while True:
+            if w.changed():
+                _redraw(w)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
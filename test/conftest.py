@@ -0,0 +1,22 @@
+import tomllib
+
+import pytest
+
+from src.fplan.fplan import Data
+
+SAMPLE = 'test/fplan/test_solve/sample.toml'
+
+
+@pytest.fixture
+def sample_config() -> dict:
+    """test/fplan/test_solve/sample.toml as parsed"""
+    with open(SAMPLE, 'rb') as f:
+        return tomllib.load(f)
+
+
+@pytest.fixture
+def sample_data() -> Data:
+    """test/fplan/test_solve/sample.toml, loaded"""
+    config_data = Data()
+    config_data.load_file(SAMPLE)
+    return config_data
@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.fplan import backends
+from src.fplan.fplan import (Data, InfeasibleError, ModelTemplate, SolveError, build_model,
+                             plan_years, solve, solve_model)
+
+
+def test_methods_agree(sample_data) -> None:
+    for formulation in ('sum', 'balance'):
+        model = build_model(sample_data, False, formulation=formulation)
+        ref = solve_model(model, method='highs-ipm')
+        for method in backends.METHODS:
+            res = solve_model(model, method=method)
+            assert math.isclose(res.fun, ref.fun, rel_tol=1e-9)
+            assert len(res.ineqlin.marginals) == model.A_ub.shape[0]
+    assert backends.timings['highs-ds']['count'] > 0
+
+
+def test_auto(sample_data) -> None:
+    assert backends.choose(400, 200, 5000) == 'highs-ds'
+    assert backends.choose(10**5, 10**4, 10**7) == 'highs-ipm'
+    with pytest.raises(ValueError):
+        solve(sample_data, False, method='simplex')
+
+
+def test_typed_errors() -> None:
+    config_data = Data()
+    config_data.load({'startage': 60, 'expense': {'x': {'amount': 1e9, 'age': '60-'}}})
+    for method in backends.METHODS:
+        with pytest.raises(InfeasibleError) as e:
+            solve(config_data, False, method=method)
+        assert isinstance(e.value, SolveError)
+        assert e.value.status == 2
+
+
+def test_highspy_warm_start(sample_data) -> None:
+    pytest.importorskip('highspy')
+    template = ModelTemplate(sample_data, False)
+    paths = np.random.default_rng(1).normal(1.06, 0.1, (3, plan_years(sample_data)))
+    for returns in paths:
+        warm = template.solve(sample_data, returns=returns, method='highspy')
+        cold = template.solve(sample_data, returns=returns, method='highs-ds')
+        assert math.isclose(warm[0], cold[0], rel_tol=1e-7)
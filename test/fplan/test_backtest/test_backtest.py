@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.fplan.backtest import backtest, read_history, window_tables
+from src.fplan.fplan import plan_years, solve
+
+
+def test_read_history(tmp_path) -> None:
+    path = tmp_path / 'history.csv'
+    path.write_text("year,returns,inflation\n1990,10,3\n1991,-5,2.5\n")
+    (years, returns, inflation) = read_history(str(path))
+    assert list(years) == [1990, 1991]
+    assert np.allclose(returns, [1.10, 0.95])
+    assert np.allclose(inflation, [1.03, 1.025])
+
+    path.write_text("year,returns,inflation\n1990,10,3\n1992,-5,2.5\n")
+    with pytest.raises(ValueError):
+        read_history(str(path))
+
+
+def test_window_tables(sample_data) -> None:
+    n = plan_years(sample_data)
+    returns = np.linspace(0.9, 1.2, n + 3)
+    tables = window_tables(sample_data, returns, np.full(n + 3, 1.02))
+    assert len(tables) == 4
+    assert np.allclose(tables[2].G, np.concatenate([[1], np.cumprod(returns[2:2 + n])]))
+    with pytest.raises(ValueError):
+        window_tables(sample_data, returns[:n - 1], returns[:n - 1])
+
+
+def test_constant_history(sample_data) -> None:
+    """Every window of a history at the config's rates is the plain plan"""
+    n = plan_years(sample_data) + 2
+    returns = np.full(n, sample_data.r_rate)
+    inflation = np.full(n, sample_data.i_rate)
+    best = solve(sample_data, False)[0]
+    for replay in (False, True):
+        table = backtest(sample_data, returns, inflation, replay=replay, jobs=2)
+        assert len(table) == 3
+        for r in table:
+            assert r['status'] == 'ok'
+            assert math.isclose(r['spend'], best, rel_tol=1e-7)
+            assert r['depleted'] is None
+            assert abs(r['estate']) < 1
+
+
+def test_bad_history(sample_data) -> None:
+    """Replayed through poor returns the fixed plan runs short, a plan
+    solved for that history spends less and doesn't"""
+    n = plan_years(sample_data)
+    returns = np.full(n, sample_data.r_rate - 0.03)
+    inflation = np.full(n, sample_data.i_rate)
+    [replayed] = backtest(sample_data, returns, inflation, replay=True, jobs=1)
+    [solved] = backtest(sample_data, returns, inflation, jobs=1)
+    assert replayed['depleted'] is not None and replayed['estate'] < 0
+    assert solved['depleted'] is None
+    assert solved['spend'] < replayed['spend']
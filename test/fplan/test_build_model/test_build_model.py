@@ -0,0 +1,116 @@
+import copy
+import math
+
+import numpy as np
+import pytest
+import scipy.sparse
+
+from src.fplan.fplan import (Data, ModelTemplate, build_model, plan_years, presolve,
+                             solve)
+
+
+def test_sparse_model_shape(sample_data) -> None:
+    model = build_model(S=sample_data, sepp=False)
+    assert scipy.sparse.issparse(model.A_ub)
+    assert model.A_ub.shape == (377, 182)
+    assert model.A_ub.nnz == 4524
+    assert model.b_ub.shape == (377,)
+
+    # blocks tile the rows in order
+    rows = [model.blocks[k] for k in model.blocks]
+    assert rows[0].start == 0
+    assert rows[-1].stop == model.A_ub.shape[0]
+    assert all(a.stop == b.start for a, b in zip(rows, rows[1:]))
+    assert rows[0].stop == 1                                   # SEPP forced off
+    assert model.blocks['brackets'].stop - model.blocks['brackets'].start == 35 * 8
+
+
+def test_sparse_model_sepp(sample_data) -> None:
+    model = build_model(S=sample_data, sepp=True)
+    assert model.A_ub.shape == (376, 182)
+    assert model.blocks['sepp'] == slice(0, 0)
+
+
+def test_template_update(sample_data) -> None:
+    template = ModelTemplate(sample_data, False)
+
+    other = copy.deepcopy(sample_data)
+    other.r_rate = 1.05
+    other.update_tables()
+    other.IRA['bal'] = 100000
+    model = template.update(other)
+    fresh = build_model(other, False)
+    assert np.array_equal(model.A_ub.indptr, fresh.A_ub.indptr)
+    assert np.array_equal(model.A_ub.indices, fresh.A_ub.indices)
+    assert np.allclose(model.A_ub.data, fresh.A_ub.data)
+    assert np.allclose(model.b_ub, fresh.b_ub)
+    assert math.isclose(template.solve(sample_data)[0], 128415.14, abs_tol=100)
+
+    other.workyr = 5
+    with pytest.raises(ValueError):
+        template.update(other)
+
+
+def test_balance_formulation() -> None:
+    """Balance variables give the same plan with far fewer nonzeros"""
+    for conf in ['test/fplan/test_solve/sample.toml', 'test/fplan/test_solve/flat.toml',
+                 'examples/railroad.toml', 'examples/401k.toml']:
+        for sepp in (False, True):
+            config_data = Data()
+            config_data.load_file(conf)
+            res = solve(config_data, sepp)
+            bal = solve(config_data, sepp, formulation='balance')
+            assert math.isclose(res[0], bal[0], rel_tol=1e-6, abs_tol=0.01)
+            assert math.isclose(res[1], bal[1], rel_tol=1e-6, abs_tol=1)
+
+
+def test_balance_formulation_early() -> None:
+    """Retire before 59 while working, so every Roth block is used"""
+    d = {'returns': 6, 'inflation': 2, 'startage': 40, 'endage': 95,
+         'prep': {'workyears': 8, 'maxsave': 50000},
+         'aftertax': {'bal': 300000, 'basis': 100000},
+         'IRA': {'bal': 600000},
+         'roth': {'bal': 80000, 'contributions': [[38, 30000]]}}
+    config_data = Data()
+    config_data.load(d)
+    returns = np.random.default_rng(3).normal(1.06, 0.1, plan_years(config_data))
+
+    res = solve(config_data, True, returns=returns)
+    model = build_model(config_data, True, returns=returns, formulation='balance')
+    assert model.eq_blocks['roth59_bal'].stop > model.eq_blocks['roth59_bal'].start
+    bal = ModelTemplate(config_data, True, 'balance').solve(config_data, returns=returns)
+    assert math.isclose(res[0], bal[0], rel_tol=1e-6)
+
+
+def test_balance_linear_nnz() -> None:
+    config_data = Data()
+    config_data.load({'startage': 30, 'endage': 120, 'IRA': {'bal': 500000}})
+    blocks = ['ira', 'roth59', 'roth', 'rmd']
+
+    def nnz(A, rows: slice) -> int:
+        return A.indptr[rows.stop] - A.indptr[rows.start]
+
+    model = build_model(config_data, False)
+    total = sum(nnz(model.A_ub, model.blocks[k]) for k in blocks)
+    model = build_model(config_data, False, formulation='balance')
+    bal = sum(nnz(model.A_ub, model.blocks[k]) for k in blocks) + model.A_eq.nnz
+    assert bal * 10 < total
+
+
+def test_presolve_brackets() -> None:
+    """Unreachable bracket rows are dropped without changing the plan"""
+    for conf in ['test/fplan/test_solve/flat.toml', 'examples/mad.toml']:
+        config_data = Data()
+        config_data.load_file(conf)
+        model = build_model(config_data, False)
+        nrows = model.A_ub.shape[0]
+        presolve(config_data, model, config_data.tables)
+        assert model.presolved > 0
+        assert model.A_ub.shape[0] == nrows - model.presolved
+        rows = list(model.blocks.values())
+        assert rows[-1].stop == model.A_ub.shape[0]
+        assert all(a.stop == b.start for a, b in zip(rows, rows[1:]))
+
+        res = solve(config_data, False)
+        full = solve(config_data, False, presolve_brackets=False)
+        assert math.isclose(res[0], full[0], rel_tol=1e-9)
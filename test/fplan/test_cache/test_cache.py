@@ -0,0 +1,64 @@
+import copy
+import time
+
+import numpy as np
+
+from src.fplan.cache import Cache, cached_solve, plan_key
+
+
+def test_plan_key(sample_data) -> None:
+    assert plan_key(sample_data, False) == plan_key(copy.deepcopy(sample_data), False)
+    assert plan_key(sample_data, False) != plan_key(sample_data, True)
+
+    changed = copy.deepcopy(sample_data)
+    changed.IRA['bal'] += 1
+    assert plan_key(sample_data, False) != plan_key(changed, False)
+
+
+def test_cached_solve(tmp_path, sample_data) -> None:
+    cache = Cache(str(tmp_path))
+    res = cached_solve(sample_data, False, cache=cache)
+    assert len(cache.entries()) == 1
+
+    (x, meta) = cache.get(plan_key(sample_data, False))
+    assert np.array_equal(x, res)
+    assert meta['status'] == 0
+    assert np.array_equal(cached_solve(sample_data, False, cache=cache), res)
+
+    cache.clear()
+    assert cache.entries() == []
+    assert cache.get(plan_key(sample_data, False)) is None
+
+
+def test_evict(tmp_path) -> None:
+    cache = Cache(str(tmp_path), max_bytes=20000)
+    for k in range(4):
+        cache.put('k%d' % k, np.zeros(1000), {'status': 0})
+        time.sleep(0.02)
+    # each entry is a bit over 8k, the oldest were dropped
+    names = [e.name for e in cache.entries()]
+    assert 'k3.npz' in names
+    assert 'k0.npz' not in names
+    assert sum(e.stat().st_size for e in cache.entries()) <= 20000
+
+
+def test_method_in_key(sample_data) -> None:
+    assert plan_key(sample_data, False, method='highs-ds') != \
+        plan_key(sample_data, False, method='highs-ipm')
+
+
+def test_unusable_cache(tmp_path, sample_data) -> None:
+    """A cache that can't be written or read is skipped"""
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = Cache(str(blocker / 'cache'))
+    res = cached_solve(sample_data, False, cache=cache)
+    assert cache.entries() == []
+
+    cache = Cache(str(tmp_path / 'cache'))
+    key = plan_key(sample_data, False)
+    cache.put(key, res, {'status': 0})
+    with open(cache._file(key), 'wb') as f:
+        f.write(b'PK\3\4 not a zip file')
+    assert cache.get(key) is None
+    assert np.array_equal(cached_solve(sample_data, False, cache=cache), res)
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+from src.fplan.check import check_file, main
+
+
+def test_check_file(tmp_path) -> None:
+    assert check_file('test/fplan/test_solve/sample.toml') is None
+    bad = tmp_path / 'bad.toml'
+    bad.write_text('returns = "six"\n')
+    assert check_file(str(bad)).startswith('TypeError')
+    assert check_file(str(tmp_path / 'missing.toml')).startswith('FileNotFoundError')
+
+
+def test_main(tmp_path, capsys) -> None:
+    main(['test/fplan/test_solve'])
+    out = capsys.readouterr().out
+    assert 'error' not in out
+    assert 'startup:' in out and 'import:' in out
+    bad = tmp_path / 'bad.toml'
+    bad.write_text('returns = "six"\n')
+    with pytest.raises(SystemExit):
+        main([str(bad)])
+
+
+def test_no_solver_imports() -> None:
+    """Loading configs and the CLI parser doesn't load scipy or highspy"""
+    code = ("import sys\n"
+            "from src.fplan.fplan import Data\n"
+            "Data().load_file('test/fplan/test_solve/sample.toml')\n"
+            "import src.fplan.check\n"
+            "print(sorted(m for m in ('scipy', 'highspy') if m in sys.modules))\n")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == '[]'
@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+
+from src.fplan.fplan import solve
+from src.fplan.frontier import estate_frontier, spend_frontier, workyears_frontier
+
+
+def test_estate_frontier(sample_data) -> None:
+    best = solve(sample_data, False)[0]
+    for formulation in ('sum', 'balance'):
+        table = estate_frontier(sample_data, [0, 500000, 1000000], formulation=formulation)
+        assert [p['status'] for p in table] == ['ok'] * 3
+        assert math.isclose(table[0]['spend'], best, rel_tol=1e-7)
+        spend = [p['spend'] for p in table]
+        assert spend[0] > spend[1] > spend[2]
+        for p in table:
+            assert math.isclose(p['estate'], p['estate_floor'], abs_tol=1)
+
+
+def test_estate_floor_matches_resolve(sample_data) -> None:
+    """A warm started point is the same as solving with a bigger balance to leave"""
+    table = estate_frontier(sample_data, [1000000, 0])
+    assert math.isclose(table[1]['spend'], solve(sample_data, False)[0], rel_tol=1e-7)
+
+
+def test_spend_frontier(sample_data) -> None:
+    best = solve(sample_data, False)[0]
+    table = spend_frontier(sample_data, [best - 20000, best - 10000, best + 1000])
+    assert table[0]['estate'] > table[1]['estate'] > 0
+    assert table[2]['status'] == 'failed'
+    # the spending for an estate is the inverse of the estate for a spending
+    back = estate_frontier(sample_data, [table[1]['estate']])
+    assert math.isclose(back[0]['spend'], best - 10000, rel_tol=1e-6)
+
+
+def test_workyears_frontier(sample_config) -> None:
+    table = workyears_frontier(sample_config, [8, 10], jobs=2)
+    assert [p['retireage'] for p in table] == [63, 65]
+    assert math.isclose(table[1]['spend'], 128415.14, abs_tol=100)
+    assert table[0]['spend'] < table[1]['spend']
+    assert np.isclose(table[1]['estate'], 0, atol=1)
@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+from src.fplan.goalseek import bisect, goalseek
+
+
+def test_bisect() -> None:
+    calls = []
+
+    def ok(v):
+        calls.append(v)
+        return v >= 37
+    assert bisect(ok, 0, 100, 1) == 37
+    assert len(calls) <= 9
+    assert bisect(lambda v: v <= 37, 0, 100, 1, increasing=False) == 37
+    assert bisect(lambda v: False, 0, 100, 1) is None
+    assert bisect(lambda v: True, 0, 100, 1) == 0
+    assert bisect(lambda v: v >= 250, 0, 1000, 50) == 250
+
+
+def test_workyears(sample_config) -> None:
+    # sample.toml sustains 107861 with 8 work years and 98562 with 7
+    r = goalseek(sample_config, 100000)
+    assert r['value'] == 8
+    assert r['probes'] <= 8
+    assert r['data'].workyr == 8
+    assert r['plan'][0] >= 100000
+    assert math.isclose(r['plan'][0], 107861.17, abs_tol=100)
+
+
+def test_maxsave_endage(sample_config) -> None:
+    r = goalseek(sample_config, 128415, 'maxsave')
+    assert r['value'] == 60000
+    r = goalseek(sample_config, 150000, 'endage')
+    assert r['value'] == 86
+    assert r['data'].endage == 86
+    assert goalseek(sample_config, 10**6, 'workyears', hi=20)['value'] is None
+
+
+def test_needs_prep() -> None:
+    with pytest.raises(ValueError):
+        goalseek({'startage': 60}, 1000)
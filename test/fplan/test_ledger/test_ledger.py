@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+from src.fplan.fplan import Data, Solution, ledger, solve
+
+
+def test_flat_ledger() -> None:
+    config_data = Data()
+    config_data.load_file('test/fplan/test_solve/flat.toml')
+    res = solve(config_data, False)
+
+    P = ledger(config_data, res)
+    assert len(P.work) == 0
+    assert len(P.years) == 50
+    assert np.array_equal(P.years['age'], np.arange(30, 80))
+    assert np.allclose(P.years['spend'], 100_000)
+    assert np.allclose(P.years['tax'], 0)
+    assert np.allclose(P.years['savings'][:6], [500_000, 400_000, 300_000, 200_000, 100_000, 0],
+                       atol=1e-3)
+    assert np.allclose(P.years['roth'][5], 9_000_000)
+    assert math.isclose(P.total_spend, 50 * 100_000)
+
+
+def test_sample_ledger(sample_data) -> None:
+    res = solve(sample_data, False)
+
+    P = ledger(sample_data, res)
+    assert len(P.work) == 10
+    assert P.work['savings'][0] == 212000
+    # work years grow into the first retirement year
+    r = sample_data.r_rate
+    assert math.isclose(P.years['savings'][0],
+                        (P.work['savings'][-1] + P.work['fsavings'][-1]) * r)
+    # every year spends at least the goal, in today's dollars
+    i_mul = sample_data.i_rate ** (np.arange(35) + 10)
+    assert np.all(P.years['spend'] >= res[0] * i_mul - 1)
+    assert np.all(P.years['rate'] >= 0)
+    assert P.total_tax > 0
+
+
+def test_solution_views(sample_data) -> None:
+    res = solve(sample_data, False)
+
+    P = Solution(sample_data, res)
+    n0 = sample_data.n0
+    assert P.goal == res[0]
+    assert np.array_equal(P.ira_withdraw, res[n0 + 1:n0 + 4 * sample_data.numyr:4])
+    assert np.array_equal(P.roth_contrib,
+                          res[sample_data.n1 + 2:n0:4])
+    # views, not copies
+    assert np.shares_memory(P.savings_withdraw, P.x)
+    P.ira_to_roth[0] = -1
+    assert P.x[n0 + 3] == -1
@@ -1,5 +1,7 @@
 import math
 
+import pytest
+
 from src.fplan.fplan import Data
 
 
@@ -71,3 +73,34 @@ def _check_sample_config_contents(cfg: Data) -> None:
 def _isclose_dol(x: float, y: float) -> bool:
     """Test for dollar values within $0.01"""
     return math.isclose(x, y, abs_tol=0.01)
+
+
+def test_cash_flow_ranges():
+    config_data = Data()
+    config_data.load({'startage': 60, 'endage': 70, 'inflation': 10,
+                      'income': {'pension': {'age': '65-', 'amount': 100, 'tax': True},
+                                 'sale': {'age': '68,62,50', 'amount': 7}},
+                      'expense': {'tuition': {'age': '61-63,61', 'amount': 10,
+                                              'inflation': True}}})
+    assert list(config_data.income) == [0, 0, 7, 0, 0, 100, 100, 100, 107, 100]
+    assert list(config_data.taxed) == [0, 0, 0, 0, 0, 100, 100, 100, 100, 100]
+    assert [round(x, 2) for x in config_data.expenses] == \
+        [0, 22.0, 12.1, 13.31, 0, 0, 0, 0, 0, 0]
+
+
+def test_reversed_age_range():
+    config_data = Data()
+    with pytest.raises(Exception, match='Bad age range 67-65'):
+        config_data.load({'startage': 60, 'endage': 70,
+                          'expense': {'car': {'age': '62,67-65', 'amount': 1000}}})
+
+
+def test_basis_without_balance():
+    config_data = Data()
+    with pytest.raises(ValueError, match='basis 1000 with no balance'):
+        config_data.load({'startage': 60, 'endage': 70,
+                          'aftertax': {'bal': 0, 'basis': 1000}})
+    # an unrealized loss is fine
+    config_data.load({'startage': 60, 'endage': 70,
+                      'aftertax': {'bal': 100000, 'basis': 150000}})
+    assert all(math.isfinite(x) for x in config_data.tables.basis)
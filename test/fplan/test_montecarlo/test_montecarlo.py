@@ -0,0 +1,41 @@
+import math
+
+import numpy as np
+
+from src.fplan.fplan import build_model, plan_years, solve
+from src.fplan.montecarlo import draw, simulate, summarize
+
+
+def test_fixed_sequence_matches(sample_data) -> None:
+    """A path with every year at the configured rate is the normal plan"""
+    n = plan_years(sample_data)
+
+    fixed = build_model(sample_data, False)
+    path = build_model(sample_data, False, returns=[1.08] * n, inflation=[1.021] * n)
+    assert np.allclose(fixed.A_ub.toarray(), path.A_ub.toarray())
+    assert np.allclose(fixed.b_ub, path.b_ub)
+
+
+def test_draw() -> None:
+    rng = np.random.default_rng(1)
+    r = draw(rng, 2000, 30, 6, 12)
+    assert r.shape == (2000, 30)
+    assert math.isclose(r.mean(), 1.06, abs_tol=0.005)
+    assert r.min() > 0
+    r = draw(rng, 2000, 30, 6, 12, 'lognormal')
+    assert math.isclose(r.mean(), 1.06, abs_tol=0.005)
+    assert np.all(draw(rng, 3, 4, 6, 0) == 1.06)
+
+
+def test_simulate(sample_data) -> None:
+    n = plan_years(sample_data)
+
+    returns = np.array([[1.08] * n, [1.04] * n, [1.12] * n])
+    spend = simulate(sample_data, False, returns, jobs=1)
+    assert math.isclose(spend[0], solve(sample_data, False)[0], abs_tol=1)
+    assert spend[1] < spend[0] < spend[2]
+
+    r = summarize(spend, spend[0])
+    assert r['paths'] == 3
+    assert r['infeasible'] == 0
+    assert math.isclose(r['below_target'], 1 / 3)
@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+
+from src.fplan import perf
+from src.fplan.fplan import Data, solve
+
+
+def test_profile_phases() -> None:
+    with perf.Profiler() as prof:
+        config_data = Data()
+        config_data.load_file('test/fplan/test_solve/sample.toml')
+        solve(config_data, False)
+    assert perf.active() is None
+
+    totals = prof.totals()
+    for name in ['toml', 'parse_expenses', 'build', 'solve']:
+        assert totals[name]['count'] == 1
+        assert totals[name]['wall'] >= 0
+    assert totals['build']['peak_mem'] > 0
+
+    (model,) = prof.models
+    assert model['rows'] == 377
+    assert model['cols'] == 182
+    assert model['nnz'] == 4524
+    assert model['blocks']['brackets'] == 35 * 8
+    assert sum(model['blocks'].values()) == model['rows']
+
+    (solver,) = prof.solver
+    assert solver['status'] == 0
+    assert solver['iterations'] > 0
+
+    report = json.loads(prof.to_json())
+    assert report['models'][0]['nnz'] == 4524
+
+
+def test_import_phase() -> None:
+    """A first solve's scipy import is its own phase, not build or solve"""
+    code = ("from src.fplan import perf\n"
+            "from src.fplan.fplan import Data, solve\n"
+            "config_data = Data()\n"
+            "config_data.load_file('test/fplan/test_solve/sample.toml')\n"
+            "with perf.Profiler(memory=False) as prof:\n"
+            "    solve(config_data, False)\n"
+            "    solve(config_data, False)\n"
+            "print(' '.join(p['phase'] for p in prof.phases))\n")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.split() == ['import', 'build', 'presolve', 'solve',
+                           'build', 'presolve', 'solve']
+
+
+def test_nested_phases() -> None:
+    with perf.Profiler() as prof:
+        with perf.phase('outer'):
+            with perf.phase('inner'):
+                x = bytearray(1 << 20)
+            del x
+    (inner, outer) = prof.phases
+    assert inner['phase'] == 'inner'
+    assert inner['peak_mem'] >= 1 << 20
+    assert outer['peak_mem'] >= inner['peak_mem']
+
+
+def test_no_profiler() -> None:
+    with perf.phase('ignored'):
+        pass
+    perf.record_model(None)
@@ -0,0 +1,73 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from src.fplan.fplan import YEAR_FIELDS, Data, ledger, solve
+from src.fplan.results import LedgerWriter
+
+
+def _ledgers(config_data: Data) -> list:
+    res = solve(config_data, False)
+    return [ledger(config_data, res), ledger(config_data, res * 0.5)]
+
+
+def test_csv(tmp_path, sample_data) -> None:
+    (a, b) = _ledgers(sample_data)
+    path = str(tmp_path / 'runs.csv')
+    # a small chunk so the file is written in several pieces
+    with LedgerWriter(path, params=['returns'], chunk_rows=10) as out:
+        out.write(0, {'returns': 6}, a)
+        out.write(1, {'returns': 4.5}, b)
+    assert out.rows == len(a.years) + len(b.years)
+
+    t = np.genfromtxt(path, delimiter=',', names=True)
+    assert list(t.dtype.names) == ['scenario', 'returns', 'goal'] + YEAR_FIELDS
+    assert len(t) == out.rows
+    n = len(a.years)
+    assert (t['scenario'][:n] == 0).all() and (t['scenario'][n:] == 1).all()
+    assert (t['returns'][n:] == 4.5).all()
+    np.testing.assert_allclose(t['goal'][:n], a.goal, atol=0.01)
+    np.testing.assert_array_equal(t['age'][:n], a.years['age'])
+    np.testing.assert_allclose(t['spend'][n:], b.years['spend'], atol=0.01)
+
+
+@pytest.mark.parametrize('ext', ['parquet', 'arrow'])
+def test_arrow(tmp_path, ext: str, sample_data) -> None:
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    (a, b) = _ledgers(sample_data)
+    path = str(tmp_path / ('runs.' + ext))
+    with LedgerWriter(path, params=['returns'], chunk_rows=10) as out:
+        for i in range(5):
+            out.write(i, {'returns': 4 + i}, a if i % 2 else b)
+    if ext == 'parquet':
+        t = pyarrow.parquet.read_table(path)
+    else:
+        with pyarrow.memory_map(path) as source:
+            t = pyarrow.ipc.open_file(source).read_all()
+    assert t.num_rows == out.rows
+    assert t.column_names == ['scenario', 'returns', 'goal'] + YEAR_FIELDS
+    scenario = t['scenario'].to_numpy()
+    rows = scenario == 3
+    np.testing.assert_array_equal(t['ira'].to_numpy()[rows], a.years['ira'])
+    assert (t['returns'].to_numpy()[rows] == 7).all()
+
+
+def test_unknown_format(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        LedgerWriter(str(tmp_path / 'runs.xlsx'))
+
+
+def test_no_pyarrow_import() -> None:
+    """Commands that may write ledgers don't load pyarrow until they do"""
+    code = ("import sys\n"
+            "import src.fplan.sweep, src.fplan.goalseek, src.fplan.sensitivity\n"
+            "import src.fplan.frontier\n"
+            "print('pyarrow' in sys.modules)\n")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == 'False'
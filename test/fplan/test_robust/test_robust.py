@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.fplan import backends
+from src.fplan.backtest import outcome
+from src.fplan.fplan import Data, Tables, plan_years, solve
+from src.fplan.montecarlo import draw
+from src.fplan.robust import robust_solve
+
+
+def _paths(config_data: Data, k: int) -> np.ndarray:
+    rng = np.random.default_rng(3)
+    return draw(rng, k, plan_years(config_data), 6, 12)
+
+
+def test_same_paths(sample_data) -> None:
+    """K copies of the config's returns is the plain plan"""
+    returns = np.full((3, plan_years(sample_data)), sample_data.r_rate)
+    r = robust_solve(sample_data, returns)
+    assert math.isclose(r['spend'], solve(sample_data, False)[0], rel_tol=1e-7)
+
+
+def test_holds_in_every_path(sample_data) -> None:
+    returns = _paths(sample_data, 8)
+    r = robust_solve(sample_data, returns)
+    best = [solve(sample_data, False, returns=path)[0] for path in returns]
+    assert r['spend'] <= min(best) + 1e-3
+    for path in returns:
+        o = outcome(sample_data, r['plan'], Tables(sample_data, path))
+        assert o['depleted'] is None
+
+
+def test_fraction(sample_data) -> None:
+    returns = _paths(sample_data, 10)
+    full = robust_solve(sample_data, returns)
+    part = robust_solve(sample_data, returns, fraction=0.8)
+    assert len(part['dropped']) == 2 and part['solves'] == 3
+    assert part['spend'] >= full['spend'] - 1e-3
+    kept = np.delete(returns, part['dropped'], axis=0)
+    assert math.isclose(robust_solve(sample_data, kept)['spend'], part['spend'],
+                        rel_tol=1e-6)
+
+
+def test_fraction_without_highspy(sample_data, monkeypatch) -> None:
+    returns = _paths(sample_data, 10)
+    expect = robust_solve(sample_data, returns, fraction=0.8)
+    monkeypatch.setattr(backends, 'HAVE_HIGHSPY', False)
+    part = robust_solve(sample_data, returns, fraction=0.8)
+    assert part['solves'] == 3
+    assert math.isclose(part['spend'], expect['spend'], rel_tol=1e-6)
+
+
+def test_memory_budget(sample_data) -> None:
+    with pytest.raises(ValueError):
+        robust_solve(sample_data, _paths(sample_data, 50), max_memory_mb=1)
@@ -0,0 +1,47 @@
+import math
+
+from src.fplan.fplan import Data, solve
+from src.fplan.sensitivity import sensitivity
+from src.fplan.sweep import apply_overrides
+
+
+def _load(d: dict) -> Data:
+    S = Data()
+    S.load(apply_overrides(d, {}))
+    return S
+
+
+def test_inputs_match_resolve(sample_config) -> None:
+    base = solve(_load(sample_config), False)[0]
+    for formulation in ('sum', 'balance'):
+        r = sensitivity(sample_config, formulation=formulation)
+        assert math.isclose(r.res.x[0], base, rel_tol=1e-9)
+        for (key, h) in [('IRA.bal', 100), ('roth.bal', 100), ('returns', 0.001)]:
+            (value, price) = r.inputs[key]
+            up = solve(_load(apply_overrides(sample_config, {key: value + h})), False)[0]
+            assert math.isclose(price, (up - base) / h, rel_tol=1e-3)
+
+
+def test_rows_named(sample_config) -> None:
+    r = sensitivity(sample_config, formulation='balance', inputs=[])
+    assert r.inputs == {}
+    assert len(r.rows) == len(r.res.ineqlin.marginals)
+    assert len(r.eq_rows) == len(r.res.eqlin.marginals)
+    ages = [age for (block, age, _, _) in r.rows if block == 'brackets']
+    assert ages[0] == 65 and ages[-1] == 99
+    assert all(price >= -1e-9 for (_, _, _, price) in r.rows)
+    assert r.binding()[0][0] == 'work'
+
+
+def test_no_sections() -> None:
+    r = sensitivity({'startage': 60, 'IRA': {'bal': 500000}})
+    assert 'aftertax.basis' not in r.inputs
+    assert 'prep.maxsave' not in r.inputs
+    assert r.inputs['aftertax.bal'][1] > 0
+
+
+def test_basis_at_balance() -> None:
+    r = sensitivity({'startage': 60, 'IRA': {'bal': 500000},
+                     'aftertax': {'bal': 100000, 'basis': 100000}},
+                    inputs=['aftertax.bal', 'aftertax.basis'])
+    assert all(math.isfinite(price) for (_, price) in r.inputs.values())
@@ -0,0 +1,48 @@
+import concurrent.futures
+import io
+import json
+import math
+
+from src.fplan.serve import handle, parse_address, serve_lines
+
+
+def test_handle_toml() -> None:
+    with open('test/fplan/test_solve/sample.toml') as f:
+        r = handle({'id': 'a', 'toml': f.read()})
+    assert r['id'] == 'a'
+    assert r['status'] == 'ok'
+    assert math.isclose(r['spend'], 128415.14, abs_tol=100)
+    assert len(r['ledger']['years']) == 35
+    assert r['ledger']['years'][0]['age'] == 65
+    json.dumps(r)
+
+
+def test_handle_config() -> None:
+    r = handle({'config': {'startage': 60, 'IRA': {'bal': 500000}},
+                'formulation': 'balance', 'ledger': False})
+    assert r['status'] == 'ok'
+    assert 'ledger' not in r
+
+    assert handle({'id': 3})['status'] == 'error'
+    assert handle({'config': {'returns': 6}})['status'] == 'error'   # no startage
+    r = handle({'config': {'startage': 60, 'expense': {'x': {'amount': 1e9, 'age': '60-'}}}})
+    assert r['status'] == 'failed'
+
+
+def test_serve_lines() -> None:
+    requests = [json.dumps({'id': 1, 'config': {'startage': 60, 'IRA': {'bal': 500000}}}),
+                '',
+                'not json',
+                json.dumps({'id': 2, 'config': {'startage': 60}, 'ledger': False})]
+    out = io.StringIO()
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        serve_lines(io.StringIO('\n'.join(requests) + '\n'), out, pool)
+    replies = {r['id']: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert replies[1]['status'] == 'ok'
+    assert replies[2]['status'] == 'ok'
+    assert replies[None]['status'] == 'error'
+
+
+def test_parse_address() -> None:
+    assert parse_address('8765') == ('127.0.0.1', 8765)
+    assert parse_address('0.0.0.0:80') == ('0.0.0.0', 80)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.fplan import snapshot
+from src.fplan.cache import plan_key
+from src.fplan.fplan import Data, load_config, solve
+
+
+def test_round_trip(tmp_path) -> None:
+    config_data = Data()
+    config_data.load_file('test/fplan/test_load_file/sample.toml')
+    path = str(tmp_path / 'sample.snap')
+    snapshot.save(config_data, path)
+
+    loaded = Data()
+    loaded.load_file(path)
+    assert plan_key(loaded, False) == plan_key(config_data, False)
+    for k in ('G', 'I', 'i_mul', 'cut', 'base', 'rate', 'basis'):
+        assert np.array_equal(getattr(loaded.tables, k), getattr(config_data.tables, k))
+    assert not loaded.income.flags.writeable
+    assert np.array_equal(solve(loaded, False), solve(config_data, False))
+
+
+def test_read_only(tmp_path) -> None:
+    config_data = Data()
+    config_data.load_file('test/fplan/test_solve/flat.toml')
+    path = str(tmp_path / 'flat.snap')
+    snapshot.save(config_data, path)
+    loaded = snapshot.load(path)
+    with pytest.raises(ValueError):
+        loaded.expenses[0] = 1
+
+
+def test_bad_version(tmp_path) -> None:
+    config_data = Data()
+    config_data.load_file('test/fplan/test_solve/flat.toml')
+    path = tmp_path / 'flat.snap'
+    snapshot.save(config_data, str(path))
+    data = path.read_bytes().replace(b'"version": %d' % snapshot.SNAPSHOT_VERSION,
+                                     b'"version": 0')
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        snapshot.load(str(path))
+
+
+def test_load_config(tmp_path) -> None:
+    path = str(tmp_path / 'sample.snap')
+    snapshot.main(['test/fplan/test_load_file/sample.toml', path])
+    assert load_config(path) == load_config('test/fplan/test_load_file/sample.toml')
+
+    bare = str(tmp_path / 'bare.snap')
+    snapshot.save(snapshot.load(path), bare)
+    with pytest.raises(ValueError):
+        load_config(bare)
@@ -0,0 +1,38 @@
+import math
+
+from src.fplan.sweep import apply_overrides, parse_grid, run_scenario, scenarios, sweep
+
+
+def test_parse_grid() -> None:
+    assert parse_grid('returns=4:6:0.5') == ('returns', [4, 4.5, 5.0, 5.5, 6.0])
+    assert parse_grid('prep.workyears=1:3:1') == ('prep.workyears', [1, 2, 3])
+    assert parse_grid('inflation=2,3') == ('inflation', [2, 3])
+    assert parse_grid('prep.inflation=true,false') == ('prep.inflation', [True, False])
+
+
+def test_overrides_copy() -> None:
+    base = {'returns': 6, 'prep': {'workyears': 10}}
+    d = apply_overrides(base, {'prep.workyears': 3, 'IRA.bal': 5})
+    assert d == {'returns': 6, 'prep': {'workyears': 3}, 'IRA': {'bal': 5}}
+    assert base == {'returns': 6, 'prep': {'workyears': 10}}
+
+
+def test_scenarios() -> None:
+    grid = [('returns', [4, 5]), ('inflation', [2, 3, 4])]
+    s = scenarios(grid)
+    assert len(s) == 6
+    assert s[0] == {'returns': 4, 'inflation': 2}
+    assert s[-1] == {'returns': 5, 'inflation': 4}
+
+
+def test_sweep(sample_config) -> None:
+    grid = [('returns', [8]), ('expense.mortgage.amount', [9000, 1e9])]
+    results = {i: r for (i, _, r) in sweep(sample_config, grid, jobs=2)}
+    assert results[0]['status'] == 'ok'
+    assert math.isclose(results[0]['spend'], 128415.14, abs_tol=100)
+    assert results[1]['status'] == 'failed'            # does not stop the sweep
+
+
+def test_run_scenario_error() -> None:
+    r = run_scenario({'returns': 6}, {}, False)           # no startage
+    assert r['status'] == 'error'
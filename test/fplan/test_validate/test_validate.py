@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.fplan.fplan import Data, ledger, solve
+from src.fplan.validate import check, income_tax, replay, validate_file
+
+
+def _solved(conf: str, sepp: bool):
+    config_data = Data()
+    config_data.load_file(conf)
+    return (config_data, solve(config_data, sepp))
+
+
+def test_plans_hold() -> None:
+    for conf in ['test/fplan/test_solve/sample.toml', 'examples/railroad.toml',
+                 'examples/401k.toml']:
+        for sepp in (False, True):
+            (config_data, res) = _solved(conf, sepp)
+            assert check(config_data, res) == []
+
+
+def test_replay_matches_ledger(sample_data) -> None:
+    res = solve(sample_data, False)
+    p = replay(sample_data, res)
+    L = ledger(sample_data, res).years
+    assert np.allclose(p['ira_bal'][:-1], L['ira'])
+    assert np.allclose(p['roth_bal'][:-1], L['roth'])
+    assert np.allclose(p['tax'], L['tax'])
+
+
+def test_short_plan() -> None:
+    """Fewer retirement years than the 5 a conversion ages"""
+    config_data = Data()
+    config_data.load({'startage': 70, 'endage': 73, 'IRA': {'bal': 200000}})
+    assert check(config_data, solve(config_data, False)) == []
+
+
+def test_income_tax() -> None:
+    config_data = Data()
+    config_data.load({'startage': 60})
+    tax = income_tax(config_data, np.array([0, 22000, 30000]), np.ones(3))
+    assert np.allclose(tax, [0, 2200, 2200 + 8000 * 0.12])
+
+
+def test_broken_plans_flagged(sample_data) -> None:
+    res = solve(sample_data, False)
+    greedy = res.copy()
+    greedy[0] *= 1.01
+    rules = {rule for (_, rule, _, _) in check(sample_data, greedy)}
+    assert rules == {'spending goal'}
+
+    early_roth = res.copy()
+    early_roth[sample_data.n0 + 2] += 50000
+    assert {'roth aging', 'roth balance'} <= \
+        {rule for (_, rule, _, _) in check(sample_data, early_roth)}
+
+    low_ira = res.copy()
+    low_ira[sample_data.n0 + 1::4] *= 0.5
+    assert 'rmd' in {rule for (_, rule, _, _) in check(sample_data, low_ira)}
+
+
+def test_validate_file() -> None:
+    (file, status, issues) = validate_file('test/fplan/test_solve/flat.toml', False)
+    assert (status, issues) == ('ok', [])
+    assert validate_file('no/such.toml', False)[1] == 'error'
@@ -0,0 +1,49 @@
+import math
+import shutil
+
+import numpy as np
+import pytest
+
+from src.fplan.fplan import Data, build_model, solve
+from src.fplan.watch import Watcher, affected_blocks, changed_sections
+
+
+def test_affected_blocks() -> None:
+    old = {'returns': 6, 'taxes': {'stded': 1}, 'IRA': {'bal': 1}}
+    assert changed_sections(old, dict(old, taxes={'stded': 2})) == {'taxes'}
+    assert affected_blocks({'taxes'}) == {'brackets'}
+    assert 'roth59' in affected_blocks({'roth'})
+    assert affected_blocks({'taxes', 'returns'}) is None
+
+
+@pytest.mark.parametrize('formulation', ['sum', 'balance'])
+def test_edits(tmp_path, formulation: str) -> None:
+    path = tmp_path / 'plan.toml'
+    shutil.copy('examples/sample.toml', path)
+    w = Watcher(str(path), formulation=formulation)
+    assert w.changed()
+    assert w.reload()['blocks'] == 'all'
+    assert not w.changed()
+
+    edits = [('state_rate = 3', 'state_rate = 5', ['brackets']),
+             ('bal = 420000', 'bal = 300000', None),
+             ('[54, 20000]', '[50, 30000]', None),
+             ('bal = 212000', 'bal = 250000', None),
+             ('workyears = 10', 'workyears = 8', 'all')]
+    for (old, new, blocks) in edits:
+        path.write_text(path.read_text().replace(old, new))
+        r = w.reload()
+        if blocks is not None:
+            assert r['blocks'] == blocks
+        # same model and plan as starting from scratch
+        config_data = Data()
+        config_data.load_file(str(path))
+        M = build_model(config_data, False, formulation=formulation)
+        W = w.template.model
+        assert abs(W.A_ub - M.A_ub).max() < 1e-9
+        assert np.allclose(W.b_ub, M.b_ub)
+        if M.A_eq is not None:
+            assert abs(W.A_eq - M.A_eq).max() < 1e-9
+            assert np.allclose(W.b_eq, M.b_eq)
+        best = solve(config_data, False, formulation=formulation)[0]
+        assert math.isclose(r['x'][0], best, rel_tol=1e-6)